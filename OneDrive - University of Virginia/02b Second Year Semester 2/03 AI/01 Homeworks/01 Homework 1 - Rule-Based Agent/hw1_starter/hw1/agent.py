@@ -1,4 +1,9 @@
-from utils import Action, ActionType, Cell, Condition
+import asyncio
+
+from inference import ConstraintEngine, SatInference
+from patterns import PatternMatcher
+from solver import FrontierSolver
+from utils import Action, ActionType, Cell, Condition, neighbor_index
 
 
 class Agent:
@@ -10,6 +15,9 @@ class Agent:
             game: An instance of the game that the agent will interact with.
         """
         self.game = game
+        # Neighbors of every cell by flat index x * width + y, shared by the games of the same size. Built on the
+        # first call to get_neighbors(), since agents of very large boards (see chunked_board) never use it
+        self.neighbor_index = None
 
     def get_next_action(self, obs):
         """
@@ -31,16 +39,28 @@ class Agent:
         Executes the game loop for the agent.
 
         The agent continuously observes the game state, determines the next action,
-        and performs the action until the game reaches a terminal condition.
+        and performs the action until the game reaches a terminal condition. If
+        get_next_action returns a list of actions, they are performed as one batch
+        with Minesweeper.step_many. If a profiler is attached to the game (see
+        profiling.StepProfiler), the latency of every decision is recorded.
 
         Returns:
             goal_test (Condition): The final state of the game, indicating whether
                                    the game is still in progress, won, or reveal a bomb.
         """
         obs = self.game.obs()
+        profiler = getattr(self.game, 'profiler', None)
         while True:
+            if profiler is not None:
+                start = profiler.clock()
             action = self.get_next_action(obs)
-            obs, goal_test = self.game.step(action)
+            if profiler is not None:
+                profiler.record_decision(start, profiler.clock())
+            # An agent may return a list of actions, which are applied as one batch
+            if isinstance(action, list):
+                obs, goal_test = self.game.step_many(action)[:2]
+            else:
+                obs, goal_test = self.game.step(action)[:2]
             if goal_test != Condition.IN_PROGRESS:
                 break
         return goal_test
@@ -57,8 +77,11 @@ class Agent:
             list of tuple: A list of tuples representing the coordinates of the neighboring cells.
                            Only includes neighbors that are within the bounds of the board.
         """
-        directions = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
-        return [(x + dx, y + dy) for dx, dy in directions if 0 <= x + dx < self.size and 0 <= y + dy < self.size]
+        index = self.neighbor_index
+        if index is None:
+            index = self.neighbor_index = neighbor_index(self.game.size, getattr(self.game, 'width', self.game.size))
+        width = index.cols
+        return [divmod(n, width) for n in index.neighbors(x * width + y)]
 
 
 class ManualGuiAgent(Agent):
@@ -70,10 +93,250 @@ class ManualGuiAgent(Agent):
 
 
 class RuleBasedAgent(Agent):
-    def __init__(self, game):
+    def __init__(self, game, batch=False, sat=False, patterns=None):
+        """
+        Initializes the rule-based agent.
+
+        Args:
+            game: An instance of the game that the agent will interact with.
+            batch (bool, optional): Whether to return all pending safe reveals as one batch of actions. Defaults to False.
+            sat (bool, optional): Whether to try proving frontier cells with inference.SatInference before computing
+                                  the bomb probabilities when the rules stall. Defaults to False.
+            patterns (PatternTable, optional): A table of local patterns to look up the cells around new numbers in
+                                               before running the rules. Defaults to None.
+        """
         super().__init__(game)
         self.size = game.size
+        self.width = getattr(game, 'width', game.size)
+        self.batch = batch
+        # Incremental inference over the revealed numbers, see inference.ConstraintEngine
+        self.engine = ConstraintEngine(game.size, self.width)
+        # Exact bomb probabilities of the frontier, used when the rules stall
+        self.solver = FrontierSolver()
+        # Incremental SAT proofs over the same revealed cells, in the SAT mode
+        self.sat = SatInference(self.engine) if sat else None
+        # Lookups of the windows around new numbers in a precomputed table, see patterns.PatternTable
+        self.patterns = PatternMatcher(self.engine, patterns) if patterns is not None else None
+        self.last_actions = []
+        self.next_guess = 0  # Cells before this flat index are known, so guesses scan from here
 
     def get_next_action(self, obs):
-        ### IMPLEMENT THIS ###
-        raise NotImplementedError("Please implement your rule-based agent")
+        """
+        Determines the next action from the cells revealed by the previous action.
+
+        Only the cells changed by the previous action are fed to the inference engine, which re-examines the
+        numbers around them. Pending safe cells are revealed first, then pending bombs are flagged, and the
+        agent guesses only when nothing can be deduced. With a pattern table, the cells around the new numbers
+        are looked up in the table first, and the rules only run when it decides no safe cell.
+
+        Args:
+            obs: The current observation from the environment.
+
+        Returns:
+            Action: The next action to take, or a list of safe reveals in batch mode.
+        """
+        engine = self.engine
+        # Read the integer codes of the compact view, whatever the observation format of the game
+        view = self.game.obs_array()
+        if not self.last_actions:
+            engine.observe_all(view)
+        for action in self.last_actions:
+            if action.action_type == ActionType.REVEAL:
+                engine.observe(view, action.x, action.y)
+        if self.patterns is None:
+            engine.propagate()
+            i = engine.next_safe()
+        else:
+            # Pending safe cells first, then the pattern table, and the rules only on a miss
+            i = engine.next_safe()
+            if i is None:
+                i = self.match_patterns()
+            if i is None:
+                engine.propagate()
+                i = engine.next_safe()
+        if i is not None:
+            action_type = ActionType.REVEAL
+            if self.batch:
+                actions = [Action(action_type, *divmod(i, self.width))]
+                i = engine.next_safe()
+                while i is not None:
+                    actions.append(Action(action_type, *divmod(i, self.width)))
+                    i = engine.next_safe()
+                self.last_actions = actions
+                return actions
+        else:
+            i = engine.next_mine()
+            if i is not None:
+                action_type = ActionType.FLAG
+            else:
+                action_type, i = ActionType.REVEAL, self.guess(view)
+        self.last_actions = [Action(action_type, *divmod(i, self.width))]
+        return self.last_actions[0]
+
+    def match_patterns(self):
+        """
+        Looks up the windows of the cells around the new numbers in the pattern table.
+
+        Returns:
+            int: The flat index of a safe cell to reveal, or None if there is none.
+        """
+        engine = self.engine
+        safe, mines = self.patterns.deduce()
+        profiler = getattr(self.game, 'profiler', None)
+        if profiler is not None:
+            profiler.count('pattern_hits', len(safe) + len(mines))
+        for i in safe:
+            engine.add_safe(i)
+        for i in mines:
+            engine.add_mine(i)
+        return engine.next_safe()
+
+    def guess(self, view):
+        """
+        Picks a cell to reveal when the rules cannot deduce anything.
+
+        The first guess is the center of the board. In the SAT mode, the agent then reveals a cell the SAT
+        solver proves safe, if there is one. Later guesses use the exact bomb probabilities of the
+        frontier solver: cells it proves safe or bombs are handed to the engine, otherwise the agent reveals
+        the cell least likely to be a bomb.
+
+        Args:
+            view: The revealed board, as returned by Minesweeper.obs_array().
+
+        Returns:
+            int: The flat index of the cell.
+        """
+        engine = self.engine
+        profiler = getattr(self.game, 'profiler', None)
+        center = (self.size // 2) * self.width + self.width // 2
+        if not self.last_actions and engine.is_unknown(center):
+            if profiler is not None:
+                profiler.count('guesses')
+            return center
+
+        if self.sat is not None:
+            if profiler is not None:
+                profiler.count('sat_calls')
+            safe, mines = self.sat.deduce()
+            for i in safe:
+                engine.add_safe(i)
+            for i in mines:
+                engine.add_mine(i)
+            i = engine.next_safe()
+            if i is not None:
+                return i
+
+        if profiler is not None:
+            profiler.count('solver_calls')
+        probabilities, other, proofs = self.solver.probabilities(view, self.size, self.game.bombs, engine.mines,
+                                                                 self.width)
+        for i, bomb in proofs.items():
+            if bomb:
+                engine.add_mine(i)
+            else:
+                engine.add_safe(i)
+        i = engine.next_safe()
+        if i is not None:
+            return i
+
+        if profiler is not None:
+            profiler.count('guesses')
+        candidates = [(p, i) for i, p in probabilities.items() if i not in proofs]
+        best = min(candidates) if candidates else None
+        if other is not None and (best is None or other < best[0]):
+            # Any cell away from the frontier, the first one nothing is known about
+            while not engine.is_unknown(self.next_guess):
+                self.next_guess += 1
+            i = self.next_guess
+            while not engine.is_unknown(i) or i in probabilities:
+                i += 1
+            return i
+        return best[1]
+
+
+class AsyncAgent(Agent):
+    """
+    An agent whose decisions are awaitable, so that one asyncio event loop can play many games at once.
+
+    Subclasses override the coroutine get_next_action, which may await a slow decision source (a solver in a
+    subprocess, a remote service...) while the other games keep playing. See play_concurrently().
+    """
+
+    async def get_next_action(self, obs):
+        """
+        Determines the next action to take based on the given observation.
+
+        Args:
+            obs: The current observation from the environment.
+
+        Returns:
+            The next action to take, or a list of actions to perform as one batch.
+
+        Raises:
+            NotImplementedError: This method should be overridden by subclasses.
+        """
+        raise NotImplementedError()
+
+    async def play(self):
+        """
+        Executes the game loop for the agent, like Agent.play, awaiting every decision.
+
+        The game steps themselves are fast and run synchronously. The loop yields to the event loop after every
+        step, so that agents whose decisions never await do not hold up the other games.
+
+        Returns:
+            goal_test (Condition): The final state of the game.
+        """
+        obs = self.game.obs()
+        profiler = getattr(self.game, 'profiler', None)
+        while True:
+            if profiler is not None:
+                start = profiler.clock()
+            action = await self.get_next_action(obs)
+            if profiler is not None:
+                profiler.record_decision(start, profiler.clock())
+            if isinstance(action, list):
+                obs, goal_test = self.game.step_many(action)[:2]
+            else:
+                obs, goal_test = self.game.step(action)[:2]
+            if goal_test != Condition.IN_PROGRESS:
+                break
+            await asyncio.sleep(0)
+        return goal_test
+
+
+class AsyncAgentAdapter(AsyncAgent):
+    def __init__(self, agent):
+        """
+        Runs a synchronous agent, such as RuleBasedAgent, in the asyncio game loop.
+
+        Args:
+            agent (Agent): The agent, whose get_next_action is called directly.
+        """
+        super().__init__(agent.game)
+        self.agent = agent
+
+    async def get_next_action(self, obs):
+        return self.agent.get_next_action(obs)
+
+
+async def play_concurrently(agents, max_concurrent=None):
+    """
+    Plays the games of many async agents concurrently on the running event loop.
+
+    Args:
+        agents (list of AsyncAgent): The agents, each with its own game.
+        max_concurrent (int, optional): The maximum number of games in progress at the same time. Defaults to all.
+
+    Returns:
+        list of Condition: The final condition of every game, in the order of the agents.
+    """
+    if not max_concurrent:
+        return await asyncio.gather(*(agent.play() for agent in agents))
+    semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def play(agent):
+        async with semaphore:
+            return await agent.play()
+
+    return await asyncio.gather(*(play(agent) for agent in agents))
@@ -4,10 +4,15 @@
 # A mini-framework for autograding
 ################################################################################
 
+import contextlib
+import io
+import multiprocessing
+import multiprocessing.connection
 import optparse
 import pickle
 import random
 import sys
+import time
 import traceback
 import json
 
@@ -25,6 +30,8 @@ class Tracker(object):
         self.prereqs = prereqs
 
         self.points = {q: 0 for q in self.questions}
+        # Measurements recorded by the tests, such as timings, per question
+        self.measurements = {q: {} for q in self.questions}
 
         self.current_question = None
 
@@ -117,6 +124,94 @@ to follow your instructor's guidelines to receive credit on your project.
     def add_points(self, pts):
         self.points[self.current_question] += pts
 
+    def add_measurement(self, name, value):
+        self.measurements[self.current_question][name] = value
+
+    def merge_result(self, pts, output, error, measurements):
+        # Merges the result of a test run in a worker process (see run_tests_parallel)
+        # between begin_test and end_test, as if the test had run in this process
+        sys.stdout.write(output)
+        if error:
+            self.unmute()
+            print(error)
+        self.add_points(pts)
+        self.measurements[self.current_question].update(measurements)
+
+class WorkerTracker(object):
+    # Collects the points and measurements of a test in a worker process, in place of the Tracker
+    def __init__(self):
+        self.points = 0
+        self.measurements = {}
+
+    def add_points(self, pts):
+        self.points += pts
+
+    def add_measurement(self, name, value):
+        self.measurements[name] = value
+
+def run_test_in_worker(index, conn):
+    output = io.StringIO()
+    tracker = WorkerTracker()
+    error = None
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+        try:
+            TESTS[index][2](tracker)
+        except:
+            error = traceback.format_exc()
+    conn.send((tracker.points, output.getvalue(), error, tracker.measurements))
+    conn.close()
+
+def run_tests_parallel(indices, workers, timeout):
+    """
+    Runs tests in worker processes, at most `workers` at a time, and kills
+    the tests that take more than `timeout` seconds (None for no limit).
+
+    Every test runs in a fresh process with its output captured, so a test
+    that hangs or crashes does not affect the others.
+
+    Returns a dict mapping the index of every test in TESTS to its
+    (points, output, error, measurements) result, error being None if the
+    test finished.
+    """
+    pending = list(indices)
+    running = {}
+    results = {}
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                index = pending.pop(0)
+                receiver, sender = multiprocessing.Pipe(duplex=False)
+                process = multiprocessing.Process(target=run_test_in_worker, args=(index, sender), daemon=True)
+                process.start()
+                sender.close()
+                deadline = time.monotonic() + timeout if timeout else None
+                running[receiver] = (index, process, deadline)
+
+            deadlines = [deadline for _, _, deadline in running.values() if deadline is not None]
+            wait_time = max(0, min(deadlines) - time.monotonic()) if deadlines else None
+            for receiver in multiprocessing.connection.wait(list(running), wait_time):
+                index, process, _ = running.pop(receiver)
+                try:
+                    results[index] = receiver.recv()
+                except EOFError:
+                    process.join()
+                    results[index] = (0, '', '*** Worker process exited with code {}'.format(process.exitcode), {})
+                receiver.close()
+                process.join()
+
+            now = time.monotonic()
+            for receiver, (index, process, deadline) in list(running.items()):
+                if deadline is not None and now >= deadline:
+                    process.terminate()
+                    process.join()
+                    receiver.close()
+                    del running[receiver]
+                    results[index] = (0, '', '*** Timed out after {} seconds'.format(timeout), {})
+    finally:
+        for _, process, _ in running.values():
+            process.terminate()
+    return results
+
 TESTS = []
 PREREQS = {}
 def add_prereq(q, pre):
@@ -154,10 +249,20 @@ def parse_options(argv):
                         dest = 'grade_question',
                         default = None,
                         help = 'Grade only one question (e.g. `-q q1`)')
+    parser.add_option('--workers', '-j',
+                        dest = 'workers',
+                        type = 'int',
+                        default = 0,
+                        help = 'Run the tests in this many worker processes in parallel (default: run them in this process)')
+    parser.add_option('--timeout',
+                        dest = 'timeout',
+                        type = 'float',
+                        default = 300,
+                        help = 'Time limit of every test in seconds when running in worker processes, 0 for none (default: 300)')
     (options, args) = parser.parse_args(argv)
     return options
 
-def produceGradeScopeOutput(maxes, points, questions):
+def produceGradeScopeOutput(maxes, points, questions, measurements=None):
     out_dct = {}
 
     # total of entire submission
@@ -185,6 +290,9 @@ def produceGradeScopeOutput(maxes, points, questions):
           max=test_out['max_score'],
           correct=('X' if not is_correct else ''),
       )
+      if measurements and measurements.get(name):
+        test_out['output'] += ''.join('\n    {}: {}'.format(key, value) for key, value in measurements[name].items())
+        test_out['extra_data'] = {'measurements': measurements[name]}
       test_out['tags'] = []
       tests_out.append(test_out)
     out_dct['tests'] = tests_out
@@ -216,15 +324,30 @@ def main():
             PREREQS[options.grade_question] = set()
 
     tracker = Tracker(questions, maxes, PREREQS, options.mute_output)
+
+    # In parallel mode, run all the tests up front and merge their results below, in order
+    results = None
+    if options.workers > 0:
+        indices = [index for index, (q, _, _) in enumerate(TESTS) if q in questions]
+        try:
+            results = run_tests_parallel(indices, options.workers, options.timeout)
+        except KeyboardInterrupt:
+            print("\n\nCaught KeyboardInterrupt: aborting autograder")
+            sys.exit(1)
+
     for q in questions:
         started = tracker.begin_q(q)
         if not started:
             continue
 
-        for testq, points, fn in TESTS:
+        for index, (testq, points, fn) in enumerate(TESTS):
             if testq != q:
                 continue
             tracker.begin_test(fn.__name__)
+            if results is not None:
+                tracker.merge_result(*results[index])
+                tracker.end_test(points)
+                continue
             try:
                 fn(tracker)
             except KeyboardInterrupt:
@@ -241,7 +364,7 @@ def main():
 
     tracker.finalize()
     if(options.gs_output):
-        produceGradeScopeOutput(tracker.maxes, tracker.points, tracker.questions)
+        produceGradeScopeOutput(tracker.maxes, tracker.points, tracker.questions, tracker.measurements)
 ################################################################################
 # Tests begin here
 ################################################################################
@@ -337,5 +460,170 @@ def question_2_goal_test(tracker):
             print("Failed Test Case 2")
 
 
+def check_performance(tracker, size, bombs, seconds, megabytes, points=1, seed=0):
+    """
+    Plays RuleBasedAgent on a seeded size x size board and gives the points
+    if the game takes at most `seconds` and its peak memory is at most
+    `megabytes`, whether or not the agent wins. The measurements are
+    recorded in the tracker.
+
+    The game is played twice on the same board: once to time it, and once
+    under tracemalloc, which is several times slower, to measure the peak
+    memory allocated by the game and the agent.
+    """
+    import tracemalloc
+    from minesweeper import Minesweeper
+    from utils import generate_board
+    from agent import RuleBasedAgent
+
+    # The first click of the agent is the center cell, keep it and its neighbors free so the game opens up
+    bomb_map = generate_board(size, bombs, seed=seed, first_click=(size // 2, size // 2), zero_first_click=True, output='packed')
+    print("Evaluating performance on a {}x{} board with {} bombs".format(size, size, bombs))
+
+    start = time.perf_counter()
+    condition = RuleBasedAgent(Minesweeper(size=size, bomb_map=bomb_map, quiet=True, compact=True)).play()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        RuleBasedAgent(Minesweeper(size=size, bomb_map=bomb_map, quiet=True, compact=True)).play()
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+    label = '{}x{}'.format(size, size)
+    tracker.add_measurement(label + ' time (s)', round(elapsed, 4))
+    tracker.add_measurement(label + ' peak memory (MB)', round(peak, 2))
+    print("Result: {}, time: {:.3f}s (budget {}s), peak memory: {:.2f}MB (budget {}MB)".format(
+        condition.value, elapsed, seconds, peak, megabytes))
+    if elapsed <= seconds and peak <= megabytes:
+        print("Within budget, get {} point{}".format(points, 's' if points != 1 else ''))
+        tracker.add_points(points)
+    else:
+        print("Over budget")
+
+
+add_prereq('q3', 'q1')
+
+@test('q3', points=1)
+def question_3_performance_small(tracker):
+    check_performance(tracker, size=16, bombs=40, seconds=1, megabytes=16)
+
+
+@test('q3', points=1)
+def question_3_performance_medium(tracker):
+    check_performance(tracker, size=100, bombs=1500, seconds=10, megabytes=64)
+
+
+@test('q3', points=1)
+def question_3_performance_large(tracker):
+    check_performance(tracker, size=500, bombs=37500, seconds=60, megabytes=256)
+
+
+
+def brute_force(num_vars, clauses, counts):
+    """
+    Lists every assignment of the variables 1..num_vars that satisfies the clauses and the counting
+    constraints, as tuples of booleans indexed by variable - 1.
+    """
+    import itertools
+    solutions = []
+    for values in itertools.product((False, True), repeat=num_vars):
+        def true(lit):
+            return values[abs(lit) - 1] == (lit > 0)
+        if all(any(true(lit) for lit in clause) for clause in clauses) and \
+                all(sum(true(lit) for lit in lits) == k for lits, k in counts):
+            solutions.append(values)
+    return solutions
+
+
+@test('q4', points=1)
+def question_4_sat_satisfiability(tracker):
+    from sat import CDCLSolver, exactly
+
+    print("Evaluating Question 4: SAT solver against brute force")
+    rng = random.Random(0)
+    for case in range(1, 3):
+        failures = 0
+        for _ in range(100):
+            num_vars = rng.randint(3, 9)
+            clauses = [[rng.choice((1, -1)) * rng.randint(1, num_vars) for _ in range(rng.randint(1, 3))]
+                       for _ in range(rng.randint(0, num_vars))]
+            counts = []
+            for _ in range(rng.randint(0, 3) if case == 1 else rng.randint(1, 4)):
+                lits = [rng.choice((1, -1)) * v for v in rng.sample(range(1, num_vars + 1), rng.randint(1, num_vars))]
+                counts.append((lits, rng.randint(0, len(lits))))
+            solver = CDCLSolver()
+            for _ in range(num_vars):
+                solver.new_var()
+            for clause in clauses:
+                solver.add_clause(clause)
+            for lits, k in counts:
+                exactly(solver, lits, k)
+            solutions = brute_force(num_vars, clauses, counts)
+            satisfiable = solver.solve()
+            if satisfiable != bool(solutions):
+                failures += 1
+            elif satisfiable and tuple(solver.model[v] == 1 for v in range(1, num_vars + 1)) not in solutions:
+                failures += 1
+            if case == 2 and not failures:
+                # Every literal must be satisfiable under assumptions exactly when some solution has it
+                for v in range(1, num_vars + 1):
+                    for lit in (v, -v):
+                        expected = any(values[v - 1] == (lit > 0) for values in solutions)
+                        if solver.solve([lit]) != expected:
+                            failures += 1
+        if failures == 0:
+            print("Passed Test Case {}, get 0.5 point".format(case))
+            tracker.add_points(0.5)
+        else:
+            print("Failed Test Case {}: {} mismatches with brute force".format(case, failures))
+
+
+@test('q5', points=1)
+def question_5_batch_matches_games(tracker):
+    from minesweeper import Minesweeper
+    from utils import Action, ActionType, Condition, generate_board
+    try:
+        import numpy as np
+        from batch import CONDITIONS, MinesweeperBatch
+    except ImportError:
+        print("Failed: MinesweeperBatch needs NumPy")
+        return
+
+    print("Evaluating Question 5: MinesweeperBatch against Minesweeper")
+    rng = random.Random(0)
+    for case, (n, size, bombs) in enumerate(((16, 5, 4), (16, 8, 6)), 1):
+        bomb_maps = [generate_board(size, bombs, seed=case * 100 + i) for i in range(n)]
+        games = [Minesweeper(size=size, bomb_map=bomb_map, quiet=True) for bomb_map in bomb_maps]
+        batch = MinesweeperBatch(n, size, bombs, bomb_maps=bomb_maps)
+        done = [False] * n
+        failures = 0
+        # Mostly reveal safe cells, so that games are won as well as lost, and sometimes flag or hit a bomb
+        safe = [[(x, y) for x in range(size) for y in range(size) if bomb_map[x][y] != 'B'] for bomb_map in bomb_maps]
+        for _ in range(4 * size * size):
+            actions = []
+            for i in range(n):
+                x, y = rng.choice(safe[i]) if rng.random() < 0.9 else (rng.randrange(size), rng.randrange(size))
+                actions.append(Action(ActionType.FLAG if rng.random() < 0.15 else ActionType.REVEAL, x, y))
+            obs, conditions = batch.step(actions)
+            for i in range(n):
+                if done[i]:
+                    continue
+                condition = games[i].step(actions[i])[1]
+                if CONDITIONS[conditions[i]] != condition or not np.array_equal(obs[i], np.asarray(games[i].obs_array())):
+                    failures += 1
+                    done[i] = True
+                elif condition != Condition.IN_PROGRESS:
+                    done[i] = True
+            if all(done):
+                break
+        if failures == 0:
+            print("Passed Test Case {}, get 0.5 point".format(case))
+            tracker.add_points(0.5)
+        else:
+            print("Failed Test Case {}: {} of {} games differ".format(case, failures, n))
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,194 @@
+import numpy as np
+
+from utils import ActionType, Cell, Condition
+
+# Codes of the condition vector returned by MinesweeperBatch.step, index into CONDITIONS
+IN_PROGRESS, WIN, BOMB = 0, 1, 2
+CONDITIONS = (Condition.IN_PROGRESS, Condition.WIN, Condition.BOMB)
+
+
+def _neighbor_sum(grids):
+    """
+    Sums the eight neighbors of every cell of a stack of 2D grids.
+
+    Args:
+        grids (numpy.ndarray): An array of shape (n, size, size).
+
+    Returns:
+        numpy.ndarray: An array of the same shape holding the neighbor sums.
+    """
+    padded = np.pad(grids, ((0, 0), (1, 1), (1, 1)))
+    return (padded[:, :-2, :-2] + padded[:, :-2, 1:-1] + padded[:, :-2, 2:] +
+            padded[:, 1:-1, :-2] + padded[:, 1:-1, 2:] +
+            padded[:, 2:, :-2] + padded[:, 2:, 1:-1] + padded[:, 2:, 2:])
+
+
+class MinesweeperBatch:
+    def __init__(self, n, size=5, bombs=5, bomb_maps=None, auto_reset=False, seed=None):
+        """
+        Runs n independent Minesweeper games in lockstep on stacked NumPy arrays.
+
+        The games follow the same rules as Minesweeper.step and Minesweeper.goal_test. The observation is an
+        int8 array of shape (n, size, size) using the Cell values as codes (Cell.UNREVEALED, Cell.FLAGGED,
+        Cell.REVEALED_BOMB) and the number of adjacent bombs for revealed cells.
+
+        Args:
+            n (int): The number of games.
+            size (int, optional): The size of every board (size x size). Defaults to 5.
+            bombs (int, optional): The number of bombs of the random boards. Defaults to 5.
+            bomb_maps (list, optional): n predefined bomb maps (list of list of str, 'B' for a bomb) used for the
+                                        first games. If None, random boards are created. Defaults to None.
+            auto_reset (bool, optional): Whether finished games are replaced by new random games at the end of
+                                         step(). Defaults to False.
+            seed (int, optional): The seed of the random boards. Defaults to None.
+        """
+        self.n = n
+        self.size = size
+        self.bombs = bombs
+        self.auto_reset = auto_reset
+        self.rng = np.random.default_rng(seed)
+
+        self.bomb = np.zeros((n, size, size), dtype=bool)
+        self.adjacent = np.zeros((n, size, size), dtype=np.int8)
+        self.revealed_board = np.empty((n, size, size), dtype=np.int8)
+        self.unrevealed_safe = np.zeros(n, dtype=np.int64)
+        self.flagged_safe = np.zeros(n, dtype=np.int64)
+        # Read-only view handed out by obs(), so agents cannot change the games
+        self._obs = self.revealed_board.view()
+        self._obs.flags.writeable = False
+
+        if bomb_maps is not None:
+            if len(bomb_maps) != n:
+                raise ValueError(f"Expected {n} bomb maps, got {len(bomb_maps)}")
+            self.bomb[:] = np.array(bomb_maps) == 'B'
+            self._start(np.arange(n))
+        else:
+            self.reset()
+
+    def reset(self, indices=None):
+        """
+        Replaces some or all games with new random games.
+
+        Args:
+            indices (array-like, optional): The indices of the games to reset. Defaults to all games.
+        """
+        indices = np.arange(self.n) if indices is None else np.asarray(indices)
+        if len(indices) == 0:
+            return
+        cells = self.size * self.size
+        bomb = np.zeros((len(indices), cells), dtype=bool)
+        if self.bombs:
+            keys = self.rng.random((len(indices), cells))
+            positions = np.argpartition(keys, self.bombs - 1, axis=1)[:, :self.bombs]
+            np.put_along_axis(bomb, positions, True, axis=1)
+        self.bomb[indices] = bomb.reshape(len(indices), self.size, self.size)
+        self._start(indices)
+
+    def _start(self, indices):
+        """
+        Clears the revealed boards and recomputes the derived arrays of games whose bombs were just set.
+
+        Args:
+            indices (numpy.ndarray): The indices of the games.
+        """
+        bomb = self.bomb[indices]
+        self.adjacent[indices] = _neighbor_sum(bomb.astype(np.int8))
+        self.revealed_board[indices] = Cell.UNREVEALED.value
+        self.unrevealed_safe[indices] = self.size * self.size - bomb.sum(axis=(1, 2))
+        self.flagged_safe[indices] = 0
+
+    def obs(self):
+        """
+        Returns the current observations of all games.
+
+        Returns:
+            numpy.ndarray: A read-only int8 array of shape (n, size, size).
+        """
+        return self._obs
+
+    def step(self, actions):
+        """
+        Takes one step in every game.
+
+        Args:
+            actions (list of Action): One action per game.
+
+        Returns:
+            tuple: The observations of all games (see obs()) and an int8 vector with the condition code of
+                   every game (IN_PROGRESS, WIN or BOMB, see CONDITIONS).
+        """
+        if len(actions) != self.n:
+            raise ValueError(f"Expected {self.n} actions, got {len(actions)}")
+        reveal = np.fromiter((action.action_type == ActionType.REVEAL for action in actions), dtype=bool, count=self.n)
+        xs = np.fromiter((action.x for action in actions), dtype=np.int64, count=self.n)
+        ys = np.fromiter((action.y for action in actions), dtype=np.int64, count=self.n)
+        return self.step_arrays(reveal, xs, ys)
+
+    def step_arrays(self, reveal, xs, ys):
+        """
+        Takes one step in every game, with the actions given as arrays.
+
+        Args:
+            reveal (numpy.ndarray): A bool vector, True to reveal the cell and False to flag or unflag it.
+            xs (numpy.ndarray): The x-coordinates of the actions.
+            ys (numpy.ndarray): The y-coordinates of the actions.
+
+        Returns:
+            tuple: The observations of all games and the vector of condition codes, as returned by step().
+        """
+        games = np.arange(self.n)
+        current = self.revealed_board[games, xs, ys]
+        # Actions on already revealed cells do nothing and leave the game in progress
+        active = current < 0
+        is_bomb = self.bomb[games, xs, ys]
+
+        hit = active & reveal & is_bomb
+        self.revealed_board[games[hit], xs[hit], ys[hit]] = Cell.REVEALED_BOMB.value
+
+        flag = active & ~reveal
+        if flag.any():
+            g, x, y = games[flag], xs[flag], ys[flag]
+            flagged = self.revealed_board[g, x, y] != Cell.FLAGGED.value
+            self.revealed_board[g, x, y] = np.where(flagged, Cell.FLAGGED.value, Cell.UNREVEALED.value)
+            delta = np.where(flagged, 1, -1) * ~is_bomb[flag]
+            self.flagged_safe[g] += delta
+            self.unrevealed_safe[g] -= delta
+
+        open_ = active & reveal & ~is_bomb
+        if open_.any():
+            self._flood(games[open_], xs[open_], ys[open_])
+
+        conditions = np.where(self.unrevealed_safe + self.flagged_safe > 0, IN_PROGRESS, WIN).astype(np.int8)
+        conditions[hit] = BOMB
+        conditions[~active] = IN_PROGRESS
+        if self.auto_reset:
+            self.reset(np.flatnonzero(conditions != IN_PROGRESS))
+        return self.obs(), conditions
+
+    def _flood(self, g, xs, ys):
+        """
+        Reveals the given safe cells and flood-fills from those with no adjacent bombs.
+
+        Every iteration grows the revealed regions of all games by one ring of cells at once.
+
+        Args:
+            g (numpy.ndarray): The indices of the games.
+            xs (numpy.ndarray): The x-coordinates of the cells to reveal.
+            ys (numpy.ndarray): The y-coordinates of the cells to reveal.
+        """
+        revealed = self.revealed_board[g]
+        adjacent = self.adjacent[g]
+        hidden = revealed < 0
+        local = np.arange(len(g))
+        region = np.zeros(revealed.shape, dtype=bool)
+        region[local, xs, ys] = True
+        frontier = region & (adjacent == 0)
+        while frontier.any():
+            grown = (_neighbor_sum(frontier.astype(np.int8)) > 0) & hidden & ~region
+            region |= grown
+            frontier = grown & (adjacent == 0)
+
+        flagged = (region & (revealed == Cell.FLAGGED.value)).sum(axis=(1, 2))
+        self.flagged_safe[g] -= flagged
+        self.unrevealed_safe[g] -= region.sum(axis=(1, 2)) - flagged
+        self.revealed_board[g] = np.where(region, adjacent, revealed)
@@ -0,0 +1,218 @@
+import importlib
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from optparse import OptionParser
+from minesweeper import Minesweeper
+from observers import GameObserver
+from utils import Condition, create_random_board, generate_board
+
+# Default board sizes: a single large board to time the construction of, and the boards of a tournament, which
+# plays every size many times
+CONSTRUCTION_SIZE = 2000
+TOURNAMENT_SIZES = (10, 20, 30)
+
+
+def bench_construction(size, bombs, repeat=3):
+    """
+    Measures how long it takes to construct a Minesweeper game on a given bomb map.
+
+    The bomb map is generated once up front, so only the work done by the constructor
+    (such as precomputing the adjacent bomb counts) is timed.
+
+    Args:
+        size (int): The size of the board (size x size).
+        bombs (int): The number of bombs to place on the board.
+        repeat (int, optional): The number of timed constructions. Defaults to 3.
+
+    Returns:
+        list of float: The wall-clock time of each construction, in seconds.
+    """
+    bomb_map = create_random_board(size, bombs)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        Minesweeper(size=size, bomb_map=bomb_map)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+class MoveTimer(GameObserver):
+    def __init__(self):
+        """
+        Records the time of every step, so that the time between steps gives the latency of each move.
+        """
+        self.times = [time.perf_counter()]
+
+    def on_step(self, game, action, condition):
+        self.times.append(time.perf_counter())
+
+
+def load_agent(path):
+    """
+    Imports an agent class given as 'module:ClassName', for example 'agent:RuleBasedAgent'.
+
+    Args:
+        path (str): The module and class name of the agent.
+
+    Returns:
+        type: The agent class.
+    """
+    module, _, name = path.partition(':')
+    return getattr(importlib.import_module(module), name)
+
+
+def run_game(agent_path, size, bombs, seed):
+    """
+    Plays one headless game of an agent on a seeded random board.
+
+    The agent is constructed before the move timer starts, so the latency of the first move does not include the
+    setup of the agent, which is timed separately.
+
+    Args:
+        agent_path (str): The agent class, as 'module:ClassName'.
+        size (int): The size of the board (size x size).
+        bombs (int): The number of bombs on the board.
+        seed (int): The seed of the random board.
+
+    Returns:
+        tuple: The final condition value, the construction time of the agent in seconds, and the latency of every
+               move in seconds.
+    """
+    game = Minesweeper(size=size, bomb_map=generate_board(size, bombs, seed=seed, output='packed'), quiet=True)
+    start = time.perf_counter()
+    agent = load_agent(agent_path)(game)
+    construction = time.perf_counter() - start
+    timer = MoveTimer()
+    game.subscribe(timer)
+    condition = agent.play()
+    latencies = [end - start for start, end in zip(timer.times, timer.times[1:])]
+    return condition.value, construction, latencies
+
+
+def _run_games(tasks):
+    return [run_game(*task) for task in tasks]
+
+
+def percentile(values, q):
+    """
+    Computes a percentile of a list of values by the nearest-rank method.
+
+    Args:
+        values (list of float): The values, sorted in increasing order.
+        q (float): The percentile, between 0 and 100.
+
+    Returns:
+        float: The percentile, or None if there are no values.
+    """
+    if not values:
+        return None
+    # The nearest rank is the smallest rank covering q percent of the values, ranks starting at 1
+    rank = max(1, math.ceil(q * len(values) / 100))
+    return values[min(len(values), rank) - 1]
+
+
+def run_tournament(agent_path, sizes, densities, games, seed=0, workers=None):
+    """
+    Plays an agent on seeded random boards of several sizes and densities across a process pool.
+
+    Game i of a configuration uses the board seed seed + i, so the same arguments always give the same boards.
+
+    Args:
+        agent_path (str): The agent class, as 'module:ClassName'.
+        sizes (list of int): The board sizes.
+        densities (list of float): The fractions of the cells that contain a bomb.
+        games (int): The number of games per size and density.
+        seed (int, optional): The seed of the first board. Defaults to 0.
+        workers (int, optional): The number of worker processes. Defaults to the number of CPUs.
+
+    Returns:
+        dict: The report, with the win rate, moves per game, agent construction time, per-move latency percentiles
+              and games/sec of every configuration and overall.
+    """
+    workers = workers or os.cpu_count()
+    configs = [(size, density, max(1, int(size * size * density))) for size in sizes for density in densities]
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for size, density, bombs in configs:
+            tasks = [(agent_path, size, bombs, seed + i) for i in range(games)]
+            # Hand the games to the workers in chunks to keep the inter-process overhead low
+            chunk = max(1, games // (workers * 4))
+            chunks = [tasks[i:i + chunk] for i in range(0, games, chunk)]
+            results.append(pool.map(_run_games, chunks))
+        results = [[game for chunk in outcome for game in chunk] for outcome in results]
+    elapsed = time.perf_counter() - start
+
+    report = {'agent': agent_path, 'seed': seed, 'games_per_config': games, 'workers': workers, 'configs': []}
+    for (size, density, bombs), outcome in zip(configs, results):
+        constructions = sorted(construction for _, construction, _ in outcome)
+        latencies = sorted(latency for _, _, moves in outcome for latency in moves)
+        report['configs'].append({
+            'size': size,
+            'density': density,
+            'bombs': bombs,
+            'win_rate': sum(1 for condition, _, _ in outcome if condition == Condition.WIN.value) / len(outcome),
+            'moves_per_game': sum(len(moves) for _, _, moves in outcome) / len(outcome),
+            'construction_ms': {name: percentile(constructions, q) * 1000 for name, q in (('p50', 50), ('max', 100))},
+            'latency_ms': {name: percentile(latencies, q) * 1000 if latencies else None
+                           for name, q in (('p50', 50), ('p90', 90), ('p99', 99), ('max', 100))},
+        })
+    report['games'] = len(configs) * games
+    report['elapsed_s'] = elapsed
+    report['games_per_sec'] = report['games'] / elapsed
+    return report
+
+
+def main():
+    """
+    Main function to parse command-line options and run the benchmark.
+
+    Without an agent, times the construction of a board. With an agent, runs a tournament
+    and prints the JSON report.
+
+    Command-line options:
+    -s, --size: Size of the board (size x size), or comma-separated sizes for a tournament. Defaults to
+                CONSTRUCTION_SIZE, or TOURNAMENT_SIZES for a tournament
+    -d, --density: Fraction of the cells that contain a bomb, or comma-separated densities for a tournament
+    -r, --repeat: Number of timed runs
+    -a, --agent: Agent class to run a tournament with, as module:ClassName
+    -g, --games: Number of games per size and density
+    -w, --workers: Number of worker processes
+    --seed: Seed of the first board
+    -o, --output: File to write the JSON report to
+    """
+    parser = OptionParser()
+    parser.add_option("-s", "--size", dest="size", help=f"Size of the board (size x size), or comma-separated sizes for a tournament "
+                      f"(default {CONSTRUCTION_SIZE}, or {','.join(map(str, TOURNAMENT_SIZES))} for a tournament)")
+    parser.add_option("-d", "--density", dest="density", default="0.15", help="Fraction of the cells that contain a bomb, or comma-separated densities for a tournament")
+    parser.add_option("-r", "--repeat", dest="repeat", type="int", default=3, help="Number of timed runs")
+    parser.add_option("-a", "--agent", dest="agent", help="Agent class to run a tournament with, as module:ClassName")
+    parser.add_option("-g", "--games", dest="games", type="int", default=1000, help="Number of games per size and density")
+    parser.add_option("-w", "--workers", dest="workers", type="int", default=None, help="Number of worker processes")
+    parser.add_option("--seed", dest="seed", type="int", default=0, help="Seed of the first board")
+    parser.add_option("-o", "--output", dest="output", help="File to write the JSON report to")
+
+    (options, args) = parser.parse_args()
+
+    if options.agent:
+        sizes = [int(size) for size in options.size.split(',')] if options.size else list(TOURNAMENT_SIZES)
+        densities = [float(density) for density in options.density.split(',')]
+        report = run_tournament(options.agent, sizes, densities, options.games, options.seed, options.workers)
+        text = json.dumps(report, indent=2)
+        print(text)
+        if options.output:
+            with open(options.output, 'w') as outfile:
+                outfile.write(text)
+        return
+
+    options.size = int(options.size) if options.size else CONSTRUCTION_SIZE
+    bombs = int(options.size * options.size * float(options.density))
+    timings = bench_construction(options.size, bombs, options.repeat)
+    print(f"Construction of a {options.size}x{options.size} board with {bombs} bombs: "
+          f"best {min(timings):.3f}s, mean {sum(timings) / len(timings):.3f}s over {len(timings)} runs")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,436 @@
+import random
+from array import array
+
+from observers import ConsolePrinter
+from utils import DIRECTIONS, ActionType, Cell, Condition
+
+UNREVEALED, FLAGGED, REVEALED_BOMB = Cell.UNREVEALED.value, Cell.FLAGGED.value, Cell.REVEALED_BOMB.value
+
+
+class ChunkedBombField:
+    def __init__(self, height, width, density=0.15, seed=0, chunk_size=64):
+        """
+        The bombs of a very large board, generated lazily and deterministically one chunk at a time.
+
+        The board is split into chunk_size x chunk_size chunks. The bombs of a chunk are sampled the first time one
+        of its cells is read, from a random generator seeded by the board seed and the chunk coordinates, so a seed
+        always gives the same board whatever order the chunks are generated in. Every chunk holds
+        round(density * cells) bombs, so the total number of bombs is known without generating the board.
+
+        Args:
+            height (int): The number of rows of the board.
+            width (int): The number of columns of the board.
+            density (float, optional): The fraction of the cells of every chunk that contain a bomb. Defaults to 0.15.
+            seed (int, optional): The seed of the board. Defaults to 0.
+            chunk_size (int, optional): The number of rows and columns of a chunk. Defaults to 64.
+        """
+        self.height = height
+        self.width = width
+        self.density = density
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.chunks = {}  # (cx, cy) -> bytearray with one byte per cell of the chunk, 1 for a bomb
+
+        # Chunks have chunk_size rows except possibly the last row of chunks, and the same for columns
+        row_sizes = [(chunk_size, height // chunk_size), (height % chunk_size, 1)]
+        column_sizes = [(chunk_size, width // chunk_size), (width % chunk_size, 1)]
+        self.bombs = sum(rows_count * columns_count * self._chunk_bombs(rows, columns)
+                         for rows, rows_count in row_sizes if rows
+                         for columns, columns_count in column_sizes if columns)
+
+    def _chunk_bombs(self, rows, columns):
+        return round(self.density * rows * columns)
+
+    def chunk(self, cx, cy):
+        """
+        Returns the bombs of a chunk, generating them on first use.
+
+        Args:
+            cx (int): The row of the chunk.
+            cy (int): The column of the chunk.
+
+        Returns:
+            bytearray: One byte per cell of the chunk in row-major order (chunk_size columns), 1 for a bomb.
+        """
+        bombs = self.chunks.get((cx, cy))
+        if bombs is None:
+            size = self.chunk_size
+            rows = min(size, self.height - cx * size)
+            columns = min(size, self.width - cy * size)
+            rng = random.Random(f"{self.seed}/{cx}/{cy}")
+            bombs = bytearray(size * size)
+            for pos in rng.sample(range(rows * columns), self._chunk_bombs(rows, columns)):
+                x, y = divmod(pos, columns)
+                bombs[x * size + y] = 1
+            self.chunks[(cx, cy)] = bombs
+        return bombs
+
+    def is_bomb(self, x, y):
+        """
+        Tells whether a cell contains a bomb.
+
+        Args:
+            x (int): The x-coordinate of the cell.
+            y (int): The y-coordinate of the cell.
+
+        Returns:
+            bool: True if the cell contains a bomb.
+        """
+        size = self.chunk_size
+        cx, lx = divmod(x, size)
+        cy, ly = divmod(y, size)
+        return self.chunk(cx, cy)[lx * size + ly] == 1
+
+    def count_adjacent_bombs(self, x, y):
+        """
+        Counts the bombs in the eight cells surrounding a cell, generating the neighboring chunks if needed.
+
+        Args:
+            x (int): The x-coordinate of the cell.
+            y (int): The y-coordinate of the cell.
+
+        Returns:
+            int: The number of adjacent bombs.
+        """
+        return sum(1 for dx, dy in DIRECTIONS
+                   if 0 <= x + dx < self.height and 0 <= y + dy < self.width and self.is_bomb(x + dx, y + dy))
+
+
+class ChunkedView:
+    def __init__(self, game):
+        """
+        Read-only view of the revealed board of a ChunkedMinesweeper, indexed as view[x, y] like Minesweeper.obs_array().
+
+        Args:
+            game (ChunkedMinesweeper): The game.
+        """
+        self.game = game
+        self.shape = (game.height, game.width)
+
+    def __getitem__(self, position):
+        return self.game.cell(*position)
+
+
+class ChunkedMinesweeper:
+    def __init__(self, height, width, density=0.15, seed=0, chunk_size=64, gui=False, quiet=True, delta=False):
+        """
+        A Minesweeper game on a board too large to hold in memory, such as 100000 x 100000.
+
+        The bombs come from a ChunkedBombField, generated lazily per chunk from the seed, and the revealed board is
+        stored per chunk as well: a chunk is only allocated once one of its cells is revealed or flagged. The memory
+        used is therefore proportional to the explored area, see allocated_chunks().
+
+        The game follows the rules of Minesweeper and offers the same step(), step_many() and goal_test() methods.
+        The observation is a ChunkedView of the integer cell codes of Minesweeper.obs_array(), and window() copies a
+        rectangle of the board. Flood fills are bounded by the board only, so on a sparse board a single reveal can
+        open a very large area.
+
+        Args:
+            height (int): The number of rows (x-coordinates) of the board.
+            width (int): The number of columns (y-coordinates) of the board.
+            density (float, optional): The fraction of the cells that contain a bomb. Defaults to 0.15.
+            seed (int, optional): The seed of the board. Defaults to 0.
+            chunk_size (int, optional): The number of rows and columns of a chunk. Defaults to 64.
+            gui (bool or str, optional): Whether to display the game in the scrolling canvas of graphics_display, which
+                                         only draws the cells in view. Defaults to False.
+            quiet (bool, optional): Whether to run without printing every action to the console. Defaults to True.
+            delta (bool, optional): Whether step() also returns the list of cells changed by the action. Defaults to False.
+        """
+        self.size = height
+        self.height = height
+        self.width = width
+        self.chunk_size = chunk_size
+        self.delta = delta
+        self.field = ChunkedBombField(height, width, density, seed, chunk_size)
+        self.bombs = self.field.bombs
+        self.chunks = {}  # (cx, cy) -> array of the cell codes of the chunk, allocated on first write
+        self._view = ChunkedView(self)
+        self._unrevealed_safe = height * width - self.bombs
+        self._flagged_safe = 0
+        self.last_action = None
+        self.last_changes = []
+        self.profiler = None  # See profiling.StepProfiler
+        self.observers = []
+        if not quiet:
+            self.observers.append(ConsolePrinter(show_board=not gui))
+        self.gui = gui
+        if gui:
+            from graphics_display import CanvasMinesweeperUI
+            self.gui = CanvasMinesweeperUI(self)
+            self.observers.append(self.gui)
+
+    def subscribe(self, observer):
+        """
+        Registers an observer that is notified after every step, see Minesweeper.subscribe().
+
+        Args:
+            observer (GameObserver): The observer.
+        """
+        self.observers.append(observer)
+
+    def unsubscribe(self, observer):
+        """
+        Removes an observer registered with subscribe().
+
+        Args:
+            observer (GameObserver): The observer to remove.
+        """
+        self.observers.remove(observer)
+
+    def cell(self, x, y):
+        """
+        Returns the integer code of a cell of the revealed board, in the format of Minesweeper.obs_array().
+
+        Args:
+            x (int): The x-coordinate of the cell.
+            y (int): The y-coordinate of the cell.
+
+        Returns:
+            int: The code of the cell.
+        """
+        size = self.chunk_size
+        cx, lx = divmod(x, size)
+        cy, ly = divmod(y, size)
+        chunk = self.chunks.get((cx, cy))
+        return UNREVEALED if chunk is None else chunk[lx * size + ly]
+
+    def _set(self, x, y, code):
+        size = self.chunk_size
+        cx, lx = divmod(x, size)
+        cy, ly = divmod(y, size)
+        chunk = self.chunks.get((cx, cy))
+        if chunk is None:
+            chunk = self.chunks[(cx, cy)] = array('b', [UNREVEALED]) * (size * size)
+        chunk[lx * size + ly] = code
+
+    def obs(self):
+        """
+        Returns the current observation of the revealed board.
+
+        Returns:
+            ChunkedView: The read-only view of the revealed board, indexed as view[x, y].
+        """
+        return self._view
+
+    def obs_array(self):
+        """
+        Returns the current observation of the revealed board, like obs().
+
+        Returns:
+            ChunkedView: The read-only view of the revealed board, indexed as view[x, y].
+        """
+        return self._view
+
+    def window(self, x, y, rows, columns):
+        """
+        Copies a rectangle of the revealed board, clipped to the board.
+
+        Args:
+            x (int): The x-coordinate of the top-left cell.
+            y (int): The y-coordinate of the top-left cell.
+            rows (int): The number of rows.
+            columns (int): The number of columns.
+
+        Returns:
+            list of list of int: The cell codes of the rectangle.
+        """
+        return [[self.cell(cx, cy) for cy in range(max(0, y), min(self.width, y + columns))]
+                for cx in range(max(0, x), min(self.height, x + rows))]
+
+    def allocated_chunks(self):
+        """
+        Reports the memory used by the board.
+
+        Returns:
+            dict: The number of chunks of revealed cells and of generated bombs, and the bytes they take.
+        """
+        cells = self.chunk_size * self.chunk_size
+        return {'revealed_chunks': len(self.chunks), 'bomb_chunks': len(self.field.chunks),
+                'bytes': (len(self.chunks) + len(self.field.chunks)) * cells}
+
+    def step(self, action):
+        """
+        Takes a step in the game, see Minesweeper.step(). An attached profiler records the step like Minesweeper's.
+
+        Args:
+            action (Action): The action to be performed.
+
+        Returns:
+            tuple: The observation and the condition of the game, and in delta mode the (x, y, code) cells changed by
+                   the action.
+        """
+        profiler = self.profiler
+        if profiler is not None:
+            start = profiler.clock()
+        changes = self._apply(action)
+        if changes is None:
+            if profiler is not None:
+                end = profiler.clock()
+                profiler.record_step(action, Condition.IN_PROGRESS, 0, start, end, end, end)
+            return (self._view, Condition.IN_PROGRESS, []) if self.delta else (self._view, Condition.IN_PROGRESS)
+        self.last_action = action
+        self.last_changes = changes
+        if profiler is not None:
+            applied = profiler.clock()
+        condition = self.goal_test()
+        if profiler is not None:
+            tested = profiler.clock()
+        for observer in self.observers:
+            observer.on_step(self, action, condition)
+        if profiler is not None:
+            profiler.record_step(action, condition, len(changes), start, applied, tested, profiler.clock())
+        if self.delta:
+            return self._view, condition, changes
+        return self._view, condition
+
+    def step_many(self, actions):
+        """
+        Takes a batch of steps with a single goal test and observer notification, see Minesweeper.step_many().
+
+        Args:
+            actions (list of Action): The actions to be performed.
+
+        Returns:
+            tuple: The observation and the condition of the game after the batch, as returned by step().
+        """
+        profiler = self.profiler
+        if profiler is not None:
+            start = profiler.clock()
+        # A cell changed by several actions of the batch is reported once, with its final value
+        changes = {}
+        last = None
+        for action in actions:
+            changed = self._apply(action)
+            if changed is None:
+                continue
+            for x, y, value in changed:
+                changes[(x, y)] = value
+            last = action
+            if action.action_type == ActionType.REVEAL and self.cell(action.x, action.y) == REVEALED_BOMB:
+                break
+        if last is None:
+            if profiler is not None and actions:
+                end = profiler.clock()
+                profiler.record_step(actions[-1], Condition.IN_PROGRESS, 0, start, end, end, end, len(actions))
+            return (self._view, Condition.IN_PROGRESS, []) if self.delta else (self._view, Condition.IN_PROGRESS)
+        changes = [(x, y, value) for (x, y), value in changes.items()]
+        self.last_action = last
+        self.last_changes = changes
+        if profiler is not None:
+            applied = profiler.clock()
+        condition = self.goal_test()
+        if profiler is not None:
+            tested = profiler.clock()
+        for observer in self.observers:
+            observer.on_step(self, last, condition)
+        if profiler is not None:
+            profiler.record_step(last, condition, len(changes), start, applied, tested, profiler.clock(), len(actions))
+        if self.delta:
+            return self._view, condition, changes
+        return self._view, condition
+
+    def _apply(self, action):
+        """
+        Updates the board based on an action, without testing the goal or notifying the observers.
+
+        Args:
+            action (Action): The action to be performed.
+
+        Returns:
+            list: The (x, y, code) cells changed by the action, or None if the action targets a revealed cell.
+        """
+        x, y = action.x, action.y
+        if not (0 <= x < self.height and 0 <= y < self.width):
+            raise ValueError(f"({x}, {y}) is outside of the {self.height}x{self.width} board")
+        current = self.cell(x, y)
+        if current >= 0:
+            return None
+        if action.action_type == ActionType.REVEAL:
+            if self.field.is_bomb(x, y):
+                self._set(x, y, REVEALED_BOMB)
+                return [(x, y, REVEALED_BOMB)]
+            return self.reveal(x, y)
+        flagged = current != FLAGGED
+        self._set(x, y, FLAGGED if flagged else UNREVEALED)
+        if not self.field.is_bomb(x, y):
+            delta = 1 if flagged else -1
+            self._flagged_safe += delta
+            self._unrevealed_safe -= delta
+        return [(x, y, FLAGGED if flagged else UNREVEALED)]
+
+    def goal_test(self):
+        """
+        Tests whether the last action revealed a bomb or the game is won, in constant time.
+
+        Returns:
+            Condition: The condition of the game.
+        """
+        last_action = self.last_action
+        if last_action.action_type == ActionType.REVEAL and self.cell(last_action.x, last_action.y) == REVEALED_BOMB:
+            return Condition.BOMB
+        if self._unrevealed_safe + self._flagged_safe > 0:
+            return Condition.IN_PROGRESS
+        return Condition.WIN
+
+    def reveal(self, x, y):
+        """
+        Reveals a safe cell and flood-fills from the cells with no adjacent bombs, allocating chunks as it goes.
+
+        Args:
+            x (int): The x-coordinate of the cell.
+            y (int): The y-coordinate of the cell.
+
+        Returns:
+            list: The (x, y, code) cells revealed.
+        """
+        height, width = self.height, self.width
+        field = self.field
+        revealed = []
+        flagged = 0
+        stack = [(x, y)]
+        while stack:
+            x, y = stack.pop()
+            current = self.cell(x, y)
+            if current >= 0:
+                continue
+            if current == FLAGGED:
+                flagged += 1
+            count = field.count_adjacent_bombs(x, y)
+            self._set(x, y, count)
+            revealed.append((x, y, count))
+            if count == 0:
+                stack.extend((x + dx, y + dy) for dx, dy in DIRECTIONS
+                             if 0 <= x + dx < height and 0 <= y + dy < width and self.cell(x + dx, y + dy) < 0)
+        self._flagged_safe -= flagged
+        self._unrevealed_safe -= len(revealed) - flagged
+        return revealed
+
+    def count_adjacent_bombs(self, x, y):
+        """
+        Counts the number of bombs adjacent to a given cell.
+
+        Args:
+            x (int): The x-coordinate of the cell.
+            y (int): The y-coordinate of the cell.
+
+        Returns:
+            int: The number of adjacent bombs.
+        """
+        return self.field.count_adjacent_bombs(x, y)
+
+    def print_board(self, rows=20, columns=40):
+        """
+        Prints the part of the revealed board around the last action, in the format of Minesweeper.print_board().
+
+        Args:
+            rows (int, optional): The number of rows to print. Defaults to 20.
+            columns (int, optional): The number of columns to print. Defaults to 40.
+        """
+        x, y = (self.last_action.x, self.last_action.y) if self.last_action else (0, 0)
+        top = min(max(0, x - rows // 2), max(0, self.height - rows))
+        left = min(max(0, y - columns // 2), max(0, self.width - columns))
+        symbols = {REVEALED_BOMB: 'B', FLAGGED: 'F', UNREVEALED: '.', 0: ' '}
+        print(f"Rows {top}-{min(self.height, top + rows) - 1}, columns {left}-{min(self.width, left + columns) - 1}")
+        for row in self.window(top, left, rows, columns):
+            print(' '.join(symbols.get(code) or str(code) for code in row))
+        print()
@@ -0,0 +1,230 @@
+import struct
+
+from minesweeper import Minesweeper
+from utils import Action, ActionType, Condition, generate_board
+
+# Binary trace format: a header, then one record per action in the order they were taken, then a footer
+# record with the final condition. A trace of a million moves takes about 5 MB.
+TRACE_MAGIC = b'MSTR'
+TRACE_VERSION = 1
+# Magic, version, flags, size, bombs, board seed, SHA-1 of the bomb map (see Minesweeper.board_hash)
+TRACE_HEADER = struct.Struct('<4sBBxxIIQ20s')
+HAS_SEED = 1
+WIDE = 2  # The coordinates are stored on 32 bits instead of 16, for boards larger than 65536x65536
+# Action record: type code, x, y
+RECORD = struct.Struct('<BHH')
+WIDE_RECORD = struct.Struct('<BII')
+# Type codes of the records, and the code of the footer record, whose x holds the final condition code
+ACTION_CODES = {ActionType.REVEAL: 0, ActionType.FLAG: 1}
+CODE_ACTIONS = {code: action_type for action_type, code in ACTION_CODES.items()}
+END = 0xFF
+CONDITION_CODES = {Condition.IN_PROGRESS: 0, Condition.WIN: 1, Condition.BOMB: 2}
+CODE_CONDITIONS = {code: condition for condition, code in CONDITION_CODES.items()}
+
+
+def final_condition(game):
+    """
+    Computes the condition of a game after its last action, without taking a step.
+
+    Args:
+        game (Minesweeper): The game.
+
+    Returns:
+        Condition: The condition of the game, Condition.IN_PROGRESS if no action was taken yet.
+    """
+    return game.goal_test() if game.last_action is not None else Condition.IN_PROGRESS
+
+
+class TraceRecorder:
+    def __init__(self, game, file_path, seed=None, buffer_size=1 << 16):
+        """
+        Records every action taken in a game to a compact binary trace file, to replay the game later.
+
+        The recorder attaches itself to the game, which then passes it every action of step() and step_many(),
+        including the actions on revealed cells that do nothing. The header holds the board seed, if the board
+        was made by generate_board(size, bombs, seed=seed), and the hash of the bomb map in every case.
+        Call close() at the end of the game to write the final condition.
+
+        Args:
+            game (Minesweeper): The game to record, before its first action.
+            file_path (str): The path of the trace file to write.
+            seed (int, optional): The seed the board was generated with. Defaults to None.
+            buffer_size (int, optional): The number of bytes buffered before writing to the file. Defaults to 64 KiB.
+
+        Raises:
+            ValueError: If the board is not square, since the header only holds its size.
+        """
+        if getattr(game, 'width', game.size) != game.size:
+            raise ValueError(f"Traces only record square boards, not {game.size}x{game.width}")
+        self.game = game
+        self.buffer_size = buffer_size
+        flags = (HAS_SEED if seed is not None else 0) | (WIDE if game.size > 0xFFFF else 0)
+        self.record_struct = WIDE_RECORD if flags & WIDE else RECORD
+        self.buffer = bytearray(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, flags, game.size, game.bombs,
+                                                  seed or 0, game.board_hash()))
+        self.file = open(file_path, 'wb')
+        self.moves = 0
+        game.recorder = self
+
+    def record(self, action):
+        """
+        Appends an action to the trace. Called by the game before it applies the action.
+
+        Args:
+            action (Action): The action.
+        """
+        self.buffer += self.record_struct.pack(ACTION_CODES[action.action_type], action.x, action.y)
+        self.moves += 1
+        if len(self.buffer) >= self.buffer_size:
+            self.file.write(self.buffer)
+            self.buffer.clear()
+
+    def close(self):
+        """
+        Writes the final condition of the game, closes the trace file and detaches the recorder from the game.
+        """
+        if self.file.closed:
+            return
+        self.buffer += self.record_struct.pack(END, CONDITION_CODES[final_condition(self.game)], 0)
+        self.file.write(self.buffer)
+        self.buffer.clear()
+        self.file.close()
+        if self.game.recorder is self:
+            self.game.recorder = None
+
+
+class Trace:
+    def __init__(self, file_path):
+        """
+        Reads a trace file written by TraceRecorder.
+
+        Attributes:
+            size (int): The size of the board (size x size).
+            bombs (int): The number of bombs on the board.
+            seed (int): The seed of the board, None if it was not recorded.
+            board_hash (bytes): The SHA-1 digest of the bomb map.
+            actions (list of Action): The actions, in the order they were taken.
+            condition (Condition): The final condition of the game, None if the trace was not closed.
+
+        Args:
+            file_path (str): The path of the trace file.
+
+        Raises:
+            ValueError: If the file is not a trace, or is truncated.
+        """
+        with open(file_path, 'rb') as infile:
+            data = infile.read()
+        if len(data) < TRACE_HEADER.size or data[:4] != TRACE_MAGIC:
+            raise ValueError(f"'{file_path}' is not a trace file")
+        _, version, flags, self.size, self.bombs, seed, self.board_hash = TRACE_HEADER.unpack_from(data)
+        if version != TRACE_VERSION:
+            raise ValueError(f"Unsupported trace version {version} in '{file_path}'")
+        self.seed = seed if flags & HAS_SEED else None
+        record_struct = WIDE_RECORD if flags & WIDE else RECORD
+        body = memoryview(data)[TRACE_HEADER.size:]
+        if len(body) % record_struct.size:
+            raise ValueError(f"The trace file '{file_path}' is truncated")
+        self.actions = []
+        self.condition = None
+        for code, x, y in record_struct.iter_unpack(body):
+            if code == END:
+                self.condition = CODE_CONDITIONS[x]
+                break
+            self.actions.append(Action(CODE_ACTIONS[code], x, y))
+
+    def __len__(self):
+        return len(self.actions)
+
+
+class Replayer:
+    def __init__(self, trace, bomb_map=None, snapshot_every=1000, gui=False):
+        """
+        Replays a trace deterministically on its board, headless at full speed or through the GUI.
+
+        The board is regenerated from the seed of the trace, or given as the bomb map the game was played on,
+        and checked against the hash of the trace. While replaying, the state of the game is saved every
+        snapshot_every moves, so that seek() can jump to any move by restoring the closest earlier snapshot
+        and applying at most snapshot_every - 1 actions.
+
+        Args:
+            trace (Trace or str): The trace, or the path of the trace file.
+            bomb_map (list of list of str or PackedBombMap, optional): The bomb map of the game. Required if the
+                                                                       trace has no seed. Defaults to None.
+            snapshot_every (int, optional): The number of moves between two snapshots. Defaults to 1000.
+            gui (bool or str, optional): The display to replay through, as for Minesweeper. Defaults to False.
+
+        Raises:
+            ValueError: If there is no bomb map for the trace, or the bomb map does not match the trace.
+        """
+        self.trace = trace if isinstance(trace, Trace) else Trace(trace)
+        if bomb_map is None:
+            if self.trace.seed is None:
+                raise ValueError("The trace has no board seed, the bomb map of the game is required")
+            bomb_map = generate_board(self.trace.size, self.trace.bombs, seed=self.trace.seed, output='packed')
+        self.game = Minesweeper(size=self.trace.size, bomb_map=bomb_map, gui=gui, quiet=True, compact=not gui)
+        if self.game.board_hash() != self.trace.board_hash:
+            raise ValueError("The bomb map does not match the board of the trace")
+        self.snapshot_every = snapshot_every
+        self.position = 0  # Number of actions of the trace applied to the game
+        self.snapshots = {0: self.game.snapshot()}
+
+    def seek(self, move):
+        """
+        Brings the game to the state after a number of moves of the trace, forwards or backwards.
+
+        The observers of the game, such as the GUI, are not notified of the skipped moves.
+
+        Args:
+            move (int): The number of moves, between 0 and len(trace).
+
+        Returns:
+            Condition: The condition of the game after the move.
+        """
+        if not 0 <= move <= len(self.trace):
+            raise ValueError(f"Move {move} is outside of the trace of {len(self.trace)} moves")
+        start = max(i for i in self.snapshots if i <= move)
+        if move < self.position or start > self.position:
+            self.game.restore(self.snapshots[start])
+            self.position = start
+        actions = self.trace.actions
+        game = self.game
+        while self.position < move:
+            end = min(move, (self.position // self.snapshot_every + 1) * self.snapshot_every)
+            for action in actions[self.position:end]:
+                if game._apply(action) is not None:
+                    game.last_action = action
+            self.position = end
+            if end % self.snapshot_every == 0 and end not in self.snapshots:
+                self.snapshots[end] = game.snapshot()
+        return final_condition(game)
+
+    def play(self):
+        """
+        Replays the remaining moves one step at a time, notifying the observers of the game (the GUI, a Throttle...).
+
+        Returns:
+            Condition: The final condition of the game.
+        """
+        game = self.game
+        for action in self.trace.actions[self.position:]:
+            game.step(action)
+            self.position += 1
+        return final_condition(game)
+
+    def run(self):
+        """
+        Replays the whole trace headless, at full speed.
+
+        Returns:
+            Condition: The final condition of the game.
+        """
+        return self.seek(len(self.trace))
+
+    def verify(self):
+        """
+        Replays the whole trace and checks that the game ends as it did when it was recorded.
+
+        Returns:
+            bool: Whether the final condition matches the one of the trace, False if the trace was not closed.
+        """
+        return self.run() == self.trace.condition
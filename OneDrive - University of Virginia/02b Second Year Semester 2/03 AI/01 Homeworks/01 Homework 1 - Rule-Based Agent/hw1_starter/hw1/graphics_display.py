@@ -1,24 +1,65 @@
+import queue
 import tkinter as tk
 import platform
 
+from observers import GameObserver
 from utils import Action, ActionType, Cell, Condition
 
-class MinesweeperUI:
-    def __init__(self, game):
+
+class UpdatePump(GameObserver):
+    """
+    Thread-safe delivery of game updates to a Tk window.
+
+    Steps may run on any thread (such as the agent thread of play.py), so on_step only posts the update to a
+    queue. The Tk main loop drains the queue with after() at most fps times per second, merging all the moves
+    posted since the previous frame into a single redraw.
+    """
+    fps = 30
+
+    def on_step(self, game, action, condition):
+        self.updates.put((condition, game.last_changes, action))
+
+    def pump(self):
+        """
+        Applies the queued updates as one frame, then schedules the next frame.
+        """
+        merged = {}
+        condition = action = None
+        while True:
+            try:
+                condition, changes, action = self.updates.get_nowait()
+            except queue.Empty:
+                break
+            for x, y, cell in changes:
+                merged[(x, y)] = cell
+        if condition is not None:
+            self.update_gui(condition, changes=[(x, y, cell) for (x, y), cell in merged.items()], action=action)
+        self.root.after(max(1, int(1000 / self.fps)), self.pump)
+
+    def start_gui(self):
+        self.root.after(0, self.pump)
+        self.root.mainloop()
+
+
+class MinesweeperUI(UpdatePump):
+    def __init__(self, game, fps=30):
         self.game = game
+        self.fps = fps
+        self.updates = queue.SimpleQueue()  # Updates posted by on_step, drained by pump()
         self.is_mac = platform.system() == "Darwin"
-        self.buttons = [[None for _ in range(self.game.size)] for _ in range(self.game.size)]
+        self.buttons = [[None for _ in range(self.game.width)] for _ in range(self.game.size)]
 
         # Create the main game window
         self.root = tk.Tk()
         self.root.title("Minesweeper")
         self.message_label = tk.Label(self.root, text="", font=("Ariel", 14))
-        self.message_label.grid(row=self.game.size, column=0, columnspan=self.game.size)
+        self.message_label.grid(row=self.game.size, column=0, columnspan=self.game.width)
+        self.highlighted = None  # The highlighted cell (x, y) of the last action
         self.create_buttons()
 
     def create_buttons(self):
         for x in range(self.game.size):
-            for y in range(self.game.size):
+            for y in range(self.game.width):
                 button = tk.Button(self.root, text='', width=4, height=2,
                                    command=lambda x=x, y=y: self.game.step(Action(ActionType.REVEAL, x, y)))
                 button.grid(row=x, column=y)
@@ -28,37 +69,27 @@ class MinesweeperUI:
                     button.bind('<Button-3>', lambda event, x=x, y=y: self.game.step(Action(ActionType.FLAG, x, y)))
                 self.buttons[x][y] = button
 
-    def update_gui(self, condition):
-        # Update the cells
-        for x in range(self.game.size):
-            for y in range(self.game.size):
-                button = self.buttons[x][y]
-                # Update cell
-                cell = self.game.revealed_board[x][y]
-                if cell == Cell.REVEALED_BOMB:
-                    button.config(text='💣', state='disabled', disabledforeground='red')
-                elif cell == Cell.FLAGGED:
-                    button.config(text='🚩', state='normal')
-                elif isinstance(self.game.revealed_board[x][y], int):
-                    if cell == 0:  # Revealed cell with no adjacent bombs
-                        button.config(text='', state='disabled', disabledforeground='black')
-                    elif cell > 0:  # Revealed cell with adjacent bombs
-                        button.config(text=str(cell), state='disabled', disabledforeground='blue')
-                else:  # Unrevealed cell
-                    button.config(text='', state='normal')
-                # Reset cell color
-                if self.is_mac:
-                    button.config(highlightbackground='SystemButtonFace')
-                else:
-                    button.config(bg='SystemButtonFace')
-        # Highlight the last action
-        if self.game.last_action:
+    def update_gui(self, condition, full=False, changes=None, action=None):
+        # Update only the cells changed since the last frame, unless a full redraw is requested
+        if changes is None:
+            changes = self.game.last_changes
+        if action is None:
             action = self.game.last_action
-            button = self.buttons[action.x][action.y]
-            if self.is_mac:
-                button.config(highlightbackground='yellow')
-            else:
-                button.config(bg='yellow')
+        if full:
+            board = self.game.revealed_board
+            for x in range(self.game.size):
+                for y in range(self.game.width):
+                    self.draw_cell(x, y, board[x][y])
+        else:
+            for x, y, cell in changes:
+                self.draw_cell(x, y, cell)
+        # Highlight the last action, and reset the color of the previously highlighted cell
+        if self.highlighted:
+            self.set_color(*self.highlighted, 'SystemButtonFace')
+            self.highlighted = None
+        if action:
+            self.set_color(action.x, action.y, 'yellow')
+            self.highlighted = (action.x, action.y)
         # Update game condition based on the goal test
         if condition == Condition.BOMB:
             self.show_goal_test_msg("Game Over! You hit a bomb!")
@@ -67,11 +98,196 @@ class MinesweeperUI:
         elif condition == Condition.IN_PROGRESS:
             self.message_label.config(text="Keep going!")
 
+    def draw_cell(self, x, y, cell):
+        """
+        Updates the button of one cell.
+
+        Args:
+            x (int): The x-coordinate of the cell.
+            y (int): The y-coordinate of the cell.
+            cell: The state of the cell, a Cell member or an int (Cell values for the integer codes of compact games).
+        """
+        button = self.buttons[x][y]
+        if isinstance(cell, int) and cell < 0:
+            cell = Cell(cell)
+        if cell == Cell.REVEALED_BOMB:
+            button.config(text='💣', state='disabled', disabledforeground='red')
+        elif cell == Cell.FLAGGED:
+            button.config(text='🚩', state='normal')
+        elif isinstance(cell, int):
+            if cell == 0:  # Revealed cell with no adjacent bombs
+                button.config(text='', state='disabled', disabledforeground='black')
+            elif cell > 0:  # Revealed cell with adjacent bombs
+                button.config(text=str(cell), state='disabled', disabledforeground='blue')
+        else:  # Unrevealed cell
+            button.config(text='', state='normal')
+
+    def set_color(self, x, y, color):
+        button = self.buttons[x][y]
+        if self.is_mac:
+            button.config(highlightbackground=color)
+        else:
+            button.config(bg=color)
+
     def show_goal_test_msg(self, message):
         self.message_label.config(text=message)
         for x in range(self.game.size):
-            for y in range(self.game.size):
+            for y in range(self.game.width):
                 self.buttons[x][y].config(state='disabled')
 
-    def start_gui(self):
-        self.root.mainloop()
+
+class CanvasMinesweeperUI(UpdatePump):
+    # Cells are drawn in square tiles of this many cells, and only once a tile scrolls into view
+    TILE = 32
+    COLORS = {Cell.UNREVEALED.value: '#bdbdbd', Cell.FLAGGED.value: '#bdbdbd', Cell.REVEALED_BOMB.value: 'red'}
+    NUMBER_COLORS = ('', 'blue', 'green', 'red', 'navy', 'maroon', 'teal', 'black', 'gray')
+
+    def __init__(self, game, cell_size=20, viewport=(800, 600), fps=30):
+        """
+        Renders the board on a single scrollable Canvas, for boards too large for one button per cell.
+
+        Only the tiles of cells visible in the viewport are drawn, and after every step only the changed cells
+        are redrawn.
+
+        Args:
+            game (Minesweeper): The game to display.
+            cell_size (int, optional): The size of a cell in pixels. Defaults to 20.
+            viewport (tuple, optional): The (width, height) of the visible area in pixels. Defaults to (800, 600).
+            fps (int, optional): The maximum number of redraws per second. Defaults to 30.
+        """
+        self.game = game
+        self.fps = fps
+        self.updates = queue.SimpleQueue()  # Updates posted by on_step, drained by pump()
+        self.cell_size = cell_size
+        self.is_mac = platform.system() == "Darwin"
+        self.items = {}  # (x, y) -> (rectangle item, text item) of the drawn cells
+        self.drawn_tiles = set()
+        self.finished = False  # Set once the game is won or lost, clicks are then ignored
+
+        # Create the main game window
+        self.root = tk.Tk()
+        self.root.title("Minesweeper")
+        # Rows (x) go down the canvas and columns (y) across
+        width, height = game.width * cell_size, game.size * cell_size
+        self.canvas = tk.Canvas(self.root, width=min(width, viewport[0]), height=min(height, viewport[1]),
+                                scrollregion=(0, 0, width, height), bg='white', highlightthickness=0)
+        xscroll = tk.Scrollbar(self.root, orient='horizontal', command=self._scroll_x)
+        yscroll = tk.Scrollbar(self.root, orient='vertical', command=self._scroll_y)
+        self.canvas.config(xscrollcommand=xscroll.set, yscrollcommand=yscroll.set)
+        self.canvas.grid(row=0, column=0, sticky='nsew')
+        yscroll.grid(row=0, column=1, sticky='ns')
+        xscroll.grid(row=1, column=0, sticky='ew')
+        self.message_label = tk.Label(self.root, text="", font=("Ariel", 14))
+        self.message_label.grid(row=2, column=0, columnspan=2)
+        self.root.grid_rowconfigure(0, weight=1)
+        self.root.grid_columnconfigure(0, weight=1)
+        self.highlight = self.canvas.create_rectangle(0, 0, 0, 0, outline='yellow', width=3, state='hidden')
+
+        self.canvas.bind('<Button-1>', lambda event: self._click(event, ActionType.REVEAL))
+        self.canvas.bind('<Button-2>' if self.is_mac else '<Button-3>', lambda event: self._click(event, ActionType.FLAG))
+        self.canvas.bind('<Configure>', lambda event: self.draw_visible())
+        self.draw_visible()
+
+    def update_gui(self, condition, full=False, changes=None, action=None):
+        if changes is None:
+            changes = self.game.last_changes
+        if action is None:
+            action = self.game.last_action
+        if full:
+            # A full redraw may show an earlier state of the game, for example when a replay seeks back
+            self.finished = condition != Condition.IN_PROGRESS
+            self.canvas.delete('cell')
+            self.items.clear()
+            self.drawn_tiles.clear()
+            self.draw_visible()
+        else:
+            view = self.game.obs_array()
+            for x, y, _ in changes:
+                # Cells of tiles that are not drawn yet will be drawn with their current state later
+                if (x, y) in self.items:
+                    self.draw_cell(x, y, view[x, y])
+        if action:
+            size = self.cell_size
+            self.canvas.coords(self.highlight, action.y * size + 1, action.x * size + 1,
+                               (action.y + 1) * size - 1, (action.x + 1) * size - 1)
+            self.canvas.itemconfig(self.highlight, state='normal')
+            self.canvas.tag_raise(self.highlight)
+        if condition == Condition.BOMB:
+            self.finished = True
+            self.message_label.config(text="Game Over! You hit a bomb!")
+        elif condition == Condition.WIN:
+            self.finished = True
+            self.message_label.config(text="Congratulations! You win!")
+        elif condition == Condition.IN_PROGRESS and not self.finished:
+            self.message_label.config(text="Keep going!")
+
+    def draw_visible(self):
+        """
+        Draws the tiles that intersect the viewport and have not been drawn yet.
+        """
+        tile = self.TILE * self.cell_size
+        left, top = self.canvas.canvasx(0), self.canvas.canvasy(0)
+        right = left + self.canvas.winfo_width()
+        bottom = top + self.canvas.winfo_height()
+        row_tiles = (self.game.size + self.TILE - 1) // self.TILE
+        column_tiles = (self.game.width + self.TILE - 1) // self.TILE
+        view = self.game.obs_array()
+        for tx in range(max(0, int(top // tile)), min(row_tiles, int(bottom // tile) + 1)):
+            for ty in range(max(0, int(left // tile)), min(column_tiles, int(right // tile) + 1)):
+                if (tx, ty) in self.drawn_tiles:
+                    continue
+                self.drawn_tiles.add((tx, ty))
+                for x in range(tx * self.TILE, min(self.game.size, (tx + 1) * self.TILE)):
+                    for y in range(ty * self.TILE, min(self.game.width, (ty + 1) * self.TILE)):
+                        self.draw_cell(x, y, view[x, y])
+        self.canvas.tag_raise(self.highlight)
+
+    def draw_cell(self, x, y, code):
+        """
+        Draws one cell, or updates its items if it was drawn before.
+
+        Args:
+            x (int): The x-coordinate of the cell.
+            y (int): The y-coordinate of the cell.
+            code (int): The state of the cell, as an integer code of Minesweeper.obs_array().
+        """
+        fill = self.COLORS.get(code, '#eeeeee')
+        if code == Cell.FLAGGED.value:
+            text, color = '🚩', 'red'
+        elif code == Cell.REVEALED_BOMB.value:
+            text, color = '💣', 'black'
+        elif code > 0:
+            text, color = str(code), self.NUMBER_COLORS[code]
+        else:
+            text, color = '', 'black'
+        items = self.items.get((x, y))
+        if items is None:
+            size = self.cell_size
+            rectangle = self.canvas.create_rectangle(y * size, x * size, (y + 1) * size, (x + 1) * size,
+                                                     fill=fill, outline='#7b7b7b', tags='cell')
+            label = self.canvas.create_text(y * size + size // 2, x * size + size // 2, text=text, fill=color,
+                                            font=("Ariel", max(6, size // 2)), tags='cell')
+            self.items[(x, y)] = (rectangle, label)
+        else:
+            self.canvas.itemconfig(items[0], fill=fill)
+            self.canvas.itemconfig(items[1], text=text, fill=color)
+
+    def _scroll_x(self, *args):
+        self.canvas.xview(*args)
+        self.draw_visible()
+
+    def _scroll_y(self, *args):
+        self.canvas.yview(*args)
+        self.draw_visible()
+
+    def _click(self, event, action_type):
+        # Like the disabled buttons of MinesweeperUI, the board takes no more actions once the game is over
+        if self.finished:
+            return
+        x = int(self.canvas.canvasy(event.y)) // self.cell_size
+        y = int(self.canvas.canvasx(event.x)) // self.cell_size
+        if 0 <= x < self.game.size and 0 <= y < self.game.width:
+            condition = self.game.step(Action(action_type, x, y))[1]
+            # The redraw is posted to the next frame, stop taking clicks right away
+            if condition != Condition.IN_PROGRESS:
+                self.finished = True
@@ -0,0 +1,372 @@
+from collections import deque
+
+from sat import CDCLSolver, exactly
+from utils import DIRECTIONS, Cell, neighbor_index
+
+# Offsets of the cells within two rows and columns of a cell
+AREA = tuple((dx, dy) for dx in range(-2, 3) for dy in range(-2, 3) if dx or dy)
+
+
+class ConstraintEngine:
+    def __init__(self, size, width=None):
+        """
+        Incremental constraint propagation over the revealed numbers of a Minesweeper board.
+
+        The engine is told about newly revealed cells and keeps a work queue of the number cells whose
+        constraints may have changed. propagate() re-examines only those cells, applying the single-point
+        rules (all remaining neighbors are safe or all are bombs) and the pairwise rules between nearby
+        numbers (the subset, 1-1 and 1-2 patterns). Deduced cells are queued as pending reveals and flags.
+
+        Cells are identified by their flat index x * width + y.
+
+        Args:
+            size (int): The size of the board (size x size), or its number of rows if a width is given.
+            width (int, optional): The number of columns of a rectangular board. Defaults to size.
+        """
+        self.size = size
+        self.width = width = size if width is None else width
+        # Shared neighbor indexes of the board size, for the adjacent cells and the cells within two rows and columns
+        self.adjacent = neighbor_index(size, width)
+        self.area = neighbor_index(size, width, AREA)
+        self.values = [None] * (size * width)  # Revealed number of each cell, None while not revealed
+        self.revealed = []  # Revealed cells in the order they were learned, followed by SatInference
+        self.mines = set()  # Cells known to contain a bomb
+        self.safe = set()  # Cells known to be safe that have not been revealed yet
+        self.safe_queue = deque()
+        self.mine_queue = deque()
+        self.work = deque()
+        self.in_work = set()
+
+    def neighbors(self, i, offsets=DIRECTIONS):
+        """
+        Lists the cells around a cell that are within the board.
+
+        Args:
+            i (int): The flat index of the cell.
+            offsets (tuple, optional): The (dx, dy) offsets to apply. Defaults to the eight adjacent cells.
+
+        Returns:
+            sequence of int: The flat indices of the cells.
+        """
+        if offsets is DIRECTIONS:
+            return self.adjacent.neighbors(i)
+        if offsets is AREA:
+            return self.area.neighbors(i)
+        return neighbor_index(self.size, self.width, offsets).neighbors(i)
+
+    def observe(self, view, x, y):
+        """
+        Learns the cells revealed by an action at (x, y), following the flood fill through cells with no adjacent bombs.
+
+        Args:
+            view: The revealed board, indexed as view[x, y] and holding the integer codes of Minesweeper.obs_array().
+            x (int): The x-coordinate of the action.
+            y (int): The y-coordinate of the action.
+        """
+        width = self.width
+        stack = [x * width + y]
+        while stack:
+            i = stack.pop()
+            value = view[divmod(i, width)]
+            if value < 0 or not self.reveal(i, value):
+                continue
+            if value == 0:
+                stack.extend(n for n in self.adjacent.neighbors(i) if self.values[n] is None)
+
+    def observe_all(self, view):
+        """
+        Learns every revealed cell and flag of a board, for an agent that starts on a game in progress.
+
+        Args:
+            view: The revealed board, indexed as view[x, y] and holding the integer codes of Minesweeper.obs_array().
+        """
+        width = self.width
+        for i in range(self.size * width):
+            value = view[divmod(i, width)]
+            if value >= 0:
+                self.reveal(i, value)
+            elif value == Cell.FLAGGED.value:
+                self.mines.add(i)
+                self._schedule_around(i)
+
+    def reveal(self, i, value):
+        """
+        Records a revealed cell.
+
+        Args:
+            i (int): The flat index of the cell.
+            value (int): The number of bombs adjacent to the cell.
+
+        Returns:
+            bool: Whether the cell was not known to be revealed before.
+        """
+        if self.values[i] is not None:
+            return False
+        self.values[i] = value
+        self.revealed.append(i)
+        self.safe.discard(i)
+        if value > 0:
+            self._schedule(i)
+        self._schedule_around(i)
+        return True
+
+    def add_safe(self, i):
+        """
+        Records a cell deduced to be safe and queues it for revealing.
+
+        Args:
+            i (int): The flat index of the cell.
+        """
+        if self.values[i] is None and i not in self.safe:
+            self.safe.add(i)
+            self.safe_queue.append(i)
+            self._schedule_around(i)
+
+    def add_mine(self, i):
+        """
+        Records a cell deduced to contain a bomb and queues it for flagging.
+
+        Args:
+            i (int): The flat index of the cell.
+        """
+        if i not in self.mines:
+            self.mines.add(i)
+            self.mine_queue.append(i)
+            self._schedule_around(i)
+
+    def next_safe(self):
+        """
+        Pops the next pending safe cell that has not been revealed in the meantime.
+
+        Returns:
+            int: The flat index of the cell, or None if there is no pending safe cell.
+        """
+        while self.safe_queue:
+            i = self.safe_queue.popleft()
+            if self.values[i] is None:
+                return i
+        return None
+
+    def next_mine(self):
+        """
+        Pops the next pending bomb to flag.
+
+        Returns:
+            int: The flat index of the cell, or None if there is no pending bomb.
+        """
+        return self.mine_queue.popleft() if self.mine_queue else None
+
+    def is_unknown(self, i):
+        """
+        Tells whether nothing is known about a cell yet.
+
+        Args:
+            i (int): The flat index of the cell.
+
+        Returns:
+            bool: True if the cell is neither revealed, nor known to be safe, nor known to contain a bomb.
+        """
+        return self.values[i] is None and i not in self.safe and i not in self.mines
+
+    def propagate(self):
+        """
+        Applies the rules to the queued number cells until no more deductions can be made.
+
+        Returns:
+            bool: Whether anything new was deduced.
+        """
+        deduced = False
+        while self.work:
+            i = self.work.popleft()
+            self.in_work.discard(i)
+            unknown, remaining = self._constraint(i)
+            if not unknown:
+                continue
+            if remaining == 0:
+                for n in unknown:
+                    self.add_safe(n)
+                deduced = True
+            elif remaining == len(unknown):
+                for n in unknown:
+                    self.add_mine(n)
+                deduced = True
+            else:
+                deduced |= self._compare_nearby(i, set(unknown), remaining)
+        return deduced
+
+    def _constraint(self, i):
+        """
+        Computes the constraint of a number cell on its unknown neighbors.
+
+        Args:
+            i (int): The flat index of a revealed cell.
+
+        Returns:
+            tuple: The list of unknown neighbors, and the number of bombs among them.
+        """
+        unknown = []
+        remaining = self.values[i]
+        for n in self.adjacent.neighbors(i):
+            if n in self.mines:
+                remaining -= 1
+            elif self.values[n] is None and n not in self.safe:
+                unknown.append(n)
+        return unknown, remaining
+
+    def _compare_nearby(self, i, unknown, remaining):
+        """
+        Applies the pairwise rules between a number cell and the number cells within two rows and columns.
+
+        For two constraints sharing cells, the bombs in the shared cells are bounded by both constraints, which
+        bounds the bombs in the cells that belong to only one of them.
+
+        Args:
+            i (int): The flat index of the number cell.
+            unknown (set of int): Its unknown neighbors.
+            remaining (int): The number of bombs among them.
+
+        Returns:
+            bool: Whether anything new was deduced.
+        """
+        for j in self.area.neighbors(i):
+            if not self.values[j]:
+                continue
+            other, other_remaining = self._constraint(j)
+            shared = unknown.intersection(other)
+            if not shared:
+                continue
+            only_i = unknown - shared
+            only_j = [n for n in other if n not in shared]
+            low = max(0, remaining - len(only_i), other_remaining - len(only_j))
+            high = min(remaining, other_remaining, len(shared))
+            deduced = False
+            for cells, total in ((only_i, remaining), (only_j, other_remaining)):
+                if not cells:
+                    continue
+                if total - low == 0:
+                    for n in cells:
+                        self.add_safe(n)
+                    deduced = True
+                elif total - high == len(cells):
+                    for n in cells:
+                        self.add_mine(n)
+                    deduced = True
+            if deduced:
+                # Cells of only_j need not be next to i, so queue i again for the pairs not compared yet
+                self._schedule(i)
+                return True
+        return False
+
+    def _schedule(self, i):
+        if i not in self.in_work:
+            self.in_work.add(i)
+            self.work.append(i)
+
+    def _schedule_around(self, i):
+        """
+        Queues the revealed number cells next to a cell whose state changed.
+
+        Args:
+            i (int): The flat index of the cell.
+        """
+        for n in self.adjacent.neighbors(i):
+            if self.values[n]:
+                self._schedule(n)
+
+
+class SatInference:
+    def __init__(self, engine, max_conflicts=10000):
+        """
+        Proves frontier cells safe or bombs with an incremental SAT solver, for the positions where the rules of
+        the ConstraintEngine stall.
+
+        Every revealed number becomes an exactly-k cardinality constraint over the variables of its unrevealed
+        neighbors (see sat.exactly), and every revealed cell a unit clause stating it is safe. The encoding
+        follows the cells revealed to the engine: every call to deduce() only encodes the cells revealed since
+        the previous call, and the solver keeps its clauses, including the learned ones and the cells it proved,
+        for the whole game. The global bomb count is not encoded.
+
+        A cell is proved safe when assuming it is a bomb is unsatisfiable, and a bomb when assuming it is safe is.
+        Every satisfying assignment found shows a value each frontier cell can take, so only the cells that were
+        never seen with the other value are tested.
+
+        Args:
+            engine (ConstraintEngine): The engine whose revealed cells are encoded.
+            max_conflicts (int, optional): The number of conflicts after which a test gives up and the cell is
+                                           left undecided. Defaults to 10000.
+        """
+        self.engine = engine
+        self.max_conflicts = max_conflicts
+        self.solver = CDCLSolver()
+        self.variables = {}  # Flat index of a cell -> its variable, true for a bomb
+        self.encoded = 0  # Number of cells of engine.revealed already encoded
+        self.frontier = set()  # Unrevealed cells next to an encoded number
+
+    def variable(self, i):
+        """
+        Returns the variable of a cell, creating it on first use.
+
+        Args:
+            i (int): The flat index of the cell.
+
+        Returns:
+            int: The variable.
+        """
+        v = self.variables.get(i)
+        if v is None:
+            v = self.variables[i] = self.solver.new_var()
+        return v
+
+    def update(self):
+        """
+        Encodes the cells revealed to the engine since the previous update.
+        """
+        engine = self.engine
+        values = engine.values
+        solver = self.solver
+        for i in engine.revealed[self.encoded:]:
+            v = self.variables.get(i)
+            if v is not None:
+                solver.add_clause([-v])
+            value = values[i]
+            if value:
+                unknown = [n for n in engine.adjacent.neighbors(i) if values[n] is None]
+                exactly(solver, [self.variable(n) for n in unknown], value)
+                self.frontier.update(unknown)
+        self.encoded = len(engine.revealed)
+
+    def deduce(self):
+        """
+        Finds the frontier cells that are safe or bombs in every assignment consistent with the revealed numbers.
+
+        Returns:
+            tuple: The lists of the flat indices of the cells proved safe and of the cells proved to be bombs.
+        """
+        self.update()
+        engine = self.engine
+        solver = self.solver
+        self.frontier = {i for i in self.frontier if engine.values[i] is None}
+        candidates = [i for i in self.frontier if engine.is_unknown(i)]
+        safe, mines = [], []
+        if not candidates or not solver.solve(max_conflicts=self.max_conflicts):
+            return safe, mines
+        can_be_bomb, can_be_safe = set(), set()
+
+        def record(model):
+            for i in candidates:
+                (can_be_bomb if model[self.variables[i]] == 1 else can_be_safe).add(i)
+
+        record(solver.model)
+        for i in candidates:
+            if i in can_be_bomb and i in can_be_safe:
+                continue
+            v = self.variables[i]
+            # Assume the value the cell was never seen with
+            assumption = -v if i in can_be_bomb else v
+            result = solver.solve([assumption], self.max_conflicts)
+            if result:
+                record(solver.model)
+            elif result is False:
+                (safe if assumption > 0 else mines).append(i)
+                solver.add_clause([-assumption])
+        return safe, mines
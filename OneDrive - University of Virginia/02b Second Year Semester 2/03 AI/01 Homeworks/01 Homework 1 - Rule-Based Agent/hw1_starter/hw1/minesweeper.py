@@ -1,31 +1,194 @@
-from graphics_display import MinesweeperUI
-from utils import ActionType, Cell, Condition, create_random_board
+import hashlib
+from array import array
+
+from observers import ConsolePrinter
+from utils import (ActionType, Cell, Condition, count_adjacent_bombs_grid, create_random_board, neighbor_index,
+                   pack_bomb_map)
+
+# Integer codes of the compact board storage: the Cell values, and 0-8 for revealed cells
+UNREVEALED, FLAGGED, REVEALED_BOMB = Cell.UNREVEALED.value, Cell.FLAGGED.value, Cell.REVEALED_BOMB.value
+CODE_TO_CELL = {cell.value: cell for cell in Cell}
+
+
+class BoardRow:
+    def __init__(self, cells, start, width):
+        """
+        Read-only row of a BoardView, indexed as row[y].
+
+        Args:
+            cells (array): The compact storage of the revealed board.
+            start (int): The flat index of the first cell of the row.
+            width (int): The number of cells of the row.
+        """
+        self.cells = cells
+        self.start = start
+        self.width = width
+
+    def __len__(self):
+        return self.width
+
+    def __getitem__(self, y):
+        if y < 0:
+            y += self.width
+        if not 0 <= y < self.width:
+            raise IndexError("board row index out of range")
+        cell = self.cells[self.start + y]
+        return cell if cell >= 0 else CODE_TO_CELL[cell]
+
+    def __iter__(self):
+        for cell in self.cells[self.start:self.start + self.width]:
+            yield cell if cell >= 0 else CODE_TO_CELL[cell]
+
+
+class BoardView:
+    def __init__(self, cells, height, width):
+        """
+        Read-only view of the compact storage of a revealed board, indexed as view[x][y] like the 2D list of obs().
+
+        Cells read as Cell members and ints, as in the list. Nothing is copied, so the view follows the game.
+
+        Args:
+            cells (array): The compact storage of the revealed board, one signed byte per cell in row-major order.
+            height (int): The number of rows.
+            width (int): The number of columns.
+        """
+        self.rows = [BoardRow(cells, x * width, width) for x in range(height)]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, x):
+        return self.rows[x]
+
+    def __iter__(self):
+        return iter(self.rows)
 
 
 class Minesweeper:
     # NOTE: Constructor
-    def __init__(self, size=5, bombs=5, bomb_map=None, gui=False):
+    def __init__(self, size=5, bombs=5, bomb_map=None, gui=False, quiet=False, compact=False, delta=False, width=None):
         """
         Initializes the Minesweeper game.
 
         Args:
-            size (int, optional): The size of the board (size x size). Defaults to 5.
+            size (int, optional): The size of the board (size x size), or its number of rows (x-coordinates) if a width
+                                  is given. Defaults to 5.
             bombs (int, optional): The number of bombs to place on the board. Defaults to 5.
-            bomb_map (list of list of int, optional): A predefined bomb map. If None, a random bomb map is created. Defaults to None.
-            gui (bool, optional): Whether to initialize the game with a GUI. Defaults to False.
+            bomb_map (list of list of int or PackedBombMap, optional): A predefined bomb map. If None, a random bomb map is created. Defaults to None.
+            gui (bool or str, optional): Whether to initialize the game with a GUI, 'canvas' for the single-Canvas
+                                         renderer of large boards. Defaults to False.
+            quiet (bool, optional): Whether to run headless, without printing anything to the console. Defaults to False.
+            compact (bool, optional): Whether to only keep the compact int8 storage of the revealed board, in which case
+                                      obs() returns a read-only BoardView of it. Defaults to False.
+            delta (bool, optional): Whether step() also returns the list of cells changed by the action. Defaults to False.
+            width (int, optional): The number of columns (y-coordinates) of a rectangular board. Defaults to size.
         """
         self.size = size
-        self.revealed_board = [[Cell.UNREVEALED for _ in range(size)] for _ in range(size)]
-
-        # The actual bomb map, you should not access this variable and read from it
-        self.__board = bomb_map if bomb_map else create_random_board(size, bombs)
+        # The dimensions of the board, the flat index of a cell being x * width + y
+        self.height = size
+        self.width = width = size if width is None else width
+        self.compact = compact
+        self.delta = delta
+        # Compact storage of the revealed board: one signed byte per cell in row-major order, see obs_array()
+        self._cells = array('b', [UNREVEALED]) * (size * width)
+        self._cells_view = memoryview(self._cells).cast('B').cast('b', [size, width]).toreadonly()
+        # The observation of compact mode, indexed as [x][y] like the list-of-lists board
+        self._board_view = BoardView(self._cells, size, width)
+        # Neighbors of every cell by flat index, shared by the games of the same size
+        self._neighbors = neighbor_index(size, width)
+        # The list-of-lists board of the default mode, kept in sync with the compact storage
+        self._board_lists = None
+        # Records every action when set, see game_trace.TraceRecorder
+        self.recorder = None
+        # Times the phases of every step when set, see profiling.StepProfiler
+        self.profiler = None
         # For GUI purposes, you do not need to access and modify these variables.
-        self.last_action = None  # Track the last revealed cell (x, y)
         self.gui = gui
+        self.reset(bomb_map, bombs)
+        # Observers notified after every step, see subscribe()
+        self.observers = []
+        if not quiet:
+            self.subscribe(ConsolePrinter(show_board=not gui))
 
         # update GUI if you're using one.
         if self.gui:
-            self.gui = MinesweeperUI(self) #update GUI if you're using one.
+            from graphics_display import CanvasMinesweeperUI, MinesweeperUI
+            self.gui = CanvasMinesweeperUI(self) if gui == 'canvas' else MinesweeperUI(self) #update GUI if you're using one.
+            self.subscribe(self.gui)
+
+    def subscribe(self, observer):
+        """
+        Registers an observer that is notified after every step.
+
+        Args:
+            observer (GameObserver): The observer, whose on_step(game, action, condition) method is called after every step.
+        """
+        self.observers.append(observer)
+
+    def unsubscribe(self, observer):
+        """
+        Removes an observer registered with subscribe().
+
+        Args:
+            observer (GameObserver): The observer to remove.
+        """
+        self.observers.remove(observer)
+
+    def reset(self, bomb_map=None, bombs=None):
+        """
+        Starts a new game on the same board size.
+
+        Args:
+            bomb_map (list of list of int or PackedBombMap, optional): A predefined bomb map. If None, a random bomb map is created. Defaults to None.
+            bombs (int, optional): The number of bombs of a random bomb map. Defaults to the bomb count of the current game.
+        """
+        size, width = self.size, self.width
+        if bombs is None:
+            bombs = self.bombs
+        self._cells[:] = array('b', [UNREVEALED]) * (size * width)
+        if not self.compact:
+            self._board_lists = [[Cell.UNREVEALED for _ in range(width)] for _ in range(size)]
+
+        # The actual bomb map (one byte per cell, 1 for a bomb), you should not access this variable and read from it
+        self.__bombs = pack_bomb_map(bomb_map if bomb_map is not None else create_random_board(size, bombs, width=width))
+        if len(self.__bombs) != size * width or getattr(bomb_map, 'width', width) != width:
+            raise ValueError(f"The bomb map does not match the board size {size}x{width}")
+        self.bombs = self.__bombs.count(1)
+        # Number of bombs around every cell, computed once so that revealing a cell is a table lookup
+        self.__adjacent = count_adjacent_bombs_grid(self.__bombs, size, width)
+        # Running counts of the non-bomb cells that are still unrevealed or flagged, kept up to date
+        # by reveal() and the FLAG branch of step() so that goal_test() does not have to scan the board
+        self._unrevealed_safe = size * width - self.bombs
+        self._flagged_safe = 0
+        self.last_action = None  # Track the last revealed cell (x, y)
+        self.last_changes = []  # The (x, y, value) cells changed by the last action
+
+    @property
+    def revealed_board(self):
+        """
+        The revealed board as a 2D list of Cell members and ints (see obs).
+
+        In compact mode the list is built from the compact storage on every access, so read it once per use.
+        """
+        if self._board_lists is not None:
+            return self._board_lists
+        cells = self._cells
+        width = self.width
+        return [[cell if cell >= 0 else CODE_TO_CELL[cell] for cell in cells[x * width:(x + 1) * width]]
+                for x in range(self.size)]
+
+    def _set_cell(self, x, y, cell):
+        """
+        Writes a Cell member to both representations of the revealed board.
+
+        Args:
+            x (int): The x-coordinate of the cell.
+            y (int): The y-coordinate of the cell.
+            cell (Cell): The new state of the cell.
+        """
+        self._cells[x * self.width + y] = cell.value
+        if self._board_lists is not None:
+            self._board_lists[x][y] = cell
 
     def obs(self):
         """
@@ -40,9 +203,62 @@ class Minesweeper:
             - int: The cell has been revealed and contains a number indicating the
 
         Returns:
-            list: A 2D list representing the revealed state of the Minesweeper board.
+            list: A 2D list representing the revealed state of the Minesweeper board, or a read-only BoardView
+                  indexed the same way if the game is compact. Use obs_array() for the integer codes.
+        """
+        if self.compact:
+            return self._board_view
+        return self._board_lists
+
+    def obs_array(self):
+        """
+        Returns a read-only, zero-copy view of the compact storage of the revealed board.
+
+        The view is a memoryview of shape (size, width) and format 'b' (int8), indexed as view[x, y].
+        numpy.asarray(view) wraps it without copying. Each cell holds one of the following codes:
+            - -3 (Cell.UNREVEALED.value): The cell has not been revealed.
+            - -1 (Cell.FLAGGED.value): The cell has been flagged by the agent.
+            - -2 (Cell.REVEALED_BOMB.value): The cell contains a bomb and has been revealed.
+            - 0 to 8: The cell has been revealed and has that many adjacent bombs.
+        The view stays valid, and follows the game, across steps and resets.
+
+        Returns:
+            memoryview: The read-only view of the revealed board.
+        """
+        return self._cells_view
+
+    def board_hash(self):
+        """
+        Identifies the bomb map without revealing it, for example to check that a trace is replayed on the right board.
+
+        Returns:
+            bytes: The SHA-1 digest of the flat bomb map.
+        """
+        return hashlib.sha1(self.__bombs).digest()
+
+    def snapshot(self):
+        """
+        Captures the state of the game in progress, which restore() can return to later.
+
+        Returns:
+            tuple: The opaque state of the game.
+        """
+        return bytes(self._cells), self._unrevealed_safe, self._flagged_safe, self.last_action
+
+    def restore(self, state):
+        """
+        Returns the game to a state captured by snapshot() on the same bomb map.
+
+        Args:
+            state (tuple): The state returned by snapshot().
         """
-        return self.revealed_board
+        cells, self._unrevealed_safe, self._flagged_safe, self.last_action = state
+        self._cells[:] = array('b', cells)
+        if not self.compact:
+            width = self.width
+            self._board_lists = [[cell if cell >= 0 else CODE_TO_CELL[cell] for cell in self._cells[x * width:(x + 1) * width]]
+                                 for x in range(self.size)]
+        self.last_changes = []
 
     def step(self, action):
         """
@@ -60,39 +276,134 @@ class Minesweeper:
                    - Condition.IN_PROGRESS: The game is still ongoing.
                    - Condition.BOMB: The game is over because a bomb was revealed.
                    - Condition.WIN: The game is won because all non-bomb cells are revealed.
+                   In delta mode, the tuple also contains the list of (x, y, value) cells changed
+                   by the action (the flood-filled region, the flag toggle or the revealed bomb),
+                   with their new values in the format of obs().
 
         Notes:
             - If the action is to reveal a cell and the cell contains a bomb, the game ends.
             - If the action is to flag a cell, the cell is marked as flagged or unflagged.
-            - The method updates the GUI if it is enabled, otherwise it prints the board
-              and the game status to the console.
+            - The method notifies the subscribed observers, such as the GUI or the console
+              printer. A quiet game without a GUI does no formatting or I/O.
+            - If a profiler is attached, the time spent updating the board, testing the goal
+              and notifying the observers is recorded.
+        """
+        profiler = self.profiler
+        if profiler is not None:
+            start = profiler.clock()
+        changes = self._apply(action)
+        if changes is None:
+            if profiler is not None:
+                end = profiler.clock()
+                profiler.record_step(action, Condition.IN_PROGRESS, 0, start, end, end, end)
+            return (self.obs(), Condition.IN_PROGRESS, []) if self.delta else (self.obs(), Condition.IN_PROGRESS)
+        # Track the last action for highlighting
+        self.last_action = action
+        self.last_changes = changes
+        if profiler is not None:
+            applied = profiler.clock()
+        # Test if the game ends and notify the observers (GUI, console printer, ...)
+        condition = self.goal_test()
+        if profiler is not None:
+            tested = profiler.clock()
+        for observer in self.observers:
+            observer.on_step(self, action, condition)
+        if profiler is not None:
+            profiler.record_step(action, condition, len(changes), start, applied, tested, profiler.clock())
+        if self.delta:
+            return self.obs(), condition, changes
+        return self.obs(), condition
+
+    def step_many(self, actions):
         """
+        Takes a batch of steps, with a single goal test and observer notification at the end.
+
+        The actions are applied in order and the batch stops after the first action that reveals a bomb.
+
+        Args:
+            actions (list of Action): The REVEAL and FLAG actions to be performed.
+
+        Returns:
+            tuple: The current observation of the board and the game condition after the batch, as returned by
+                   step(). In delta mode, the tuple also contains the cells changed by the whole batch, each once
+                   with its final value, in the order they first changed.
+        """
+        profiler = self.profiler
+        if profiler is not None:
+            start = profiler.clock()
+        # A cell changed by several actions of the batch is reported once, with its final value
+        changes = {}
+        last = None
+        for action in actions:
+            changed = self._apply(action)
+            if changed is None:
+                continue
+            for x, y, value in changed:
+                changes[(x, y)] = value
+            last = action
+            if action.action_type == ActionType.REVEAL and self._cells[action.x * self.width + action.y] == REVEALED_BOMB:
+                break
+        if last is None:
+            if profiler is not None and actions:
+                end = profiler.clock()
+                profiler.record_step(actions[-1], Condition.IN_PROGRESS, 0, start, end, end, end, len(actions))
+            return (self.obs(), Condition.IN_PROGRESS, []) if self.delta else (self.obs(), Condition.IN_PROGRESS)
+        changes = [(x, y, value) for (x, y), value in changes.items()]
+        self.last_action = last
+        self.last_changes = changes
+        if profiler is not None:
+            applied = profiler.clock()
+        condition = self.goal_test()
+        if profiler is not None:
+            tested = profiler.clock()
+        for observer in self.observers:
+            observer.on_step(self, last, condition)
+        if profiler is not None:
+            profiler.record_step(last, condition, len(changes), start, applied, tested, profiler.clock(), len(actions))
+        if self.delta:
+            return self.obs(), condition, changes
+        return self.obs(), condition
+
+    def _apply(self, action):
+        """
+        Updates the board based on an action, without testing the goal or notifying the observers.
+
+        Args:
+            action (Action): The action to be performed.
+
+        Returns:
+            list: The (x, y, value) cells changed by the action in the order they changed, with their new values in
+                  the format of obs(), or None if the action targets an already revealed cell and does nothing.
+        """
+        if self.recorder is not None:
+            self.recorder.record(action)
         x, y = action.x, action.y
-        print(f"Action: {action.action_type} at ({x}, {y})")
-        if isinstance(self.revealed_board[x][y], int) and self.revealed_board[x][y] >= 0:
-            return self.obs(), Condition.IN_PROGRESS
+        width = self.width
+        cells = self._cells
+        i = x * width + y
+        if cells[i] >= 0:
+            return None
         # Update the board based on the action
         if action.action_type == ActionType.REVEAL:
-            if self.__board[x][y] == 'B':
-                self.revealed_board[x][y] = Cell.REVEALED_BOMB
+            if self.__bombs[i]:
+                self._set_cell(x, y, Cell.REVEALED_BOMB)
+                changed = [(x, y)]
             else:
-                self.reveal(x, y)
+                changed = []
+                self.reveal(x, y, changed)
         elif action.action_type == ActionType.FLAG: #flag/unflag
-            self.revealed_board[x][y] = Cell.FLAGGED if self.revealed_board[x][y] != Cell.FLAGGED else Cell.UNREVEALED
-        # Track the last action for highlighting
-        self.last_action = action
-        # Test if the game ends and update the GUI if necessary
-        condition = self.goal_test()
-        if self.gui:
-            self.gui.update_gui(condition)
-        else:
-            self.print_board()
-            if condition == Condition.BOMB:
-                print("Game Over! You hit a bomb!")
-            elif condition == Condition.WIN:
-                print("Congratulations! You win!")
-        return self.obs(), condition
-    
+            flagged = cells[i] != FLAGGED
+            self._set_cell(x, y, Cell.FLAGGED if flagged else Cell.UNREVEALED)
+            if not self.__bombs[i]:
+                delta = 1 if flagged else -1
+                self._flagged_safe += delta
+                self._unrevealed_safe -= delta
+            changed = [(x, y)]
+        if self.compact:
+            return [(cx, cy, cells[cx * width + cy]) for cx, cy in changed]
+        return [(cx, cy, cells[cx * width + cy] if cells[cx * width + cy] >= 0 else CODE_TO_CELL[cells[cx * width + cy]])
+                for cx, cy in changed]
+
     def goal_test(self):
         """
         Tests the current state of the game to determine if the goal has been reached.
@@ -102,20 +413,20 @@ class Minesweeper:
                 - Condition.BOMB: If the last action revealed a bomb.
                 - Condition.IN_PROGRESS: If there are still unrevealed or flagged cells that are not bombs.
                 - Condition.WIN: If all non-bomb cells have been revealed.
+
+        Notes:
+            - Runs in constant time using the counts of unrevealed and flagged non-bomb cells.
         """
 
         last_action = self.last_action
 
         # 1. If the last action revealed a bomb, you lose (return Condition.bomb)
-        if (last_action.action_type == ActionType.REVEAL) and (self.revealed_board[last_action.x][last_action.y] == Cell.REVEALED_BOMB):
+        if (last_action.action_type == ActionType.REVEAL) and (self._cells[last_action.x * self.width + last_action.y] == REVEALED_BOMB):
             return Condition.BOMB # you lose!
 
         # 2. Else if there are still unrevealed (or flagged) non-bomb cells remaining
-        for row_i in range(self.size):
-            for col_i in range(self.size):
-                curr_cell = self.revealed_board[row_i][col_i] #self.revealed_board shows user-visible condition
-                if (curr_cell == Cell.FLAGGED or curr_cell == Cell.UNREVEALED) and (self.__board[row_i][col_i] != 'B'):
-                    return Condition.IN_PROGRESS
+        if self._unrevealed_safe or self._flagged_safe:
+            return Condition.IN_PROGRESS
 
         # 3. You didn't click on a bomb, and there are no non-bombs left that are flagged or unrevealed.
         return Condition.WIN
@@ -136,18 +447,19 @@ class Minesweeper:
 
         This method does not return any value; it only prints the board to the console.
         """
+        board = self.revealed_board
         for x in range(self.size):
             row = []
-            for y in range(self.size):
-                if self.revealed_board[x][y] == Cell.REVEALED_BOMB:
+            for y in range(self.width):
+                if board[x][y] == Cell.REVEALED_BOMB:
                     row.append('B')
-                elif self.revealed_board[x][y] == Cell.FLAGGED:
+                elif board[x][y] == Cell.FLAGGED:
                     row.append('F')
-                elif isinstance(self.revealed_board[x][y], int):
-                    if self.revealed_board[x][y] == 0:
+                elif isinstance(board[x][y], int):
+                    if board[x][y] == 0:
                         row.append(' ')
-                    elif self.revealed_board[x][y] > 0:
-                        row.append(str(self.revealed_board[x][y]))
+                    elif board[x][y] > 0:
+                        row.append(str(board[x][y]))
                 else:
                     row.append('.')
             print(' '.join(row))
@@ -155,34 +467,68 @@ class Minesweeper:
 
     def reveal(self, x, y, revealed=None):
         """
-        Reveals the cell at the given coordinates (x, y) and recursively reveals adjacent cells if the cell has no adjacent bombs.
+        Reveals the cell at the given coordinates (x, y) and flood-fills the adjacent cells if the cell has no adjacent bombs.
+
+        The flood fill is iterative (an explicit stack of frontier cells), so its cost is proportional to the
+        number of cells it reveals and it is not limited by Python's recursion depth.
 
         Args:
             x (int): The x-coordinate of the cell to reveal.
             y (int): The y-coordinate of the cell to reveal.
-            revealed (set, optional): A set of coordinates that have already been revealed. Defaults to None.
+            revealed (set or list, optional): A set of coordinates that have already been revealed. Newly revealed
+                                              coordinates are added to it, or appended in reveal order if it is a
+                                              list. Defaults to None.
 
         Returns:
             None
         """
         if revealed is None:
             revealed = set()
-        if (x, y) in revealed:
+        width = self.width
+        cells = self._cells
+        board = self._board_lists
+        adjacent = self.__adjacent
+        add = revealed.append if isinstance(revealed, list) else revealed.add
+        i = x * width + y
+        if cells[i] >= 0 or (x, y) in revealed:
             return
-        revealed.add((x, y))
-        count = self.count_adjacent_bombs(x, y)
-        self.revealed_board[x][y] = count
-        if count == 0:
-            directions = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
-            for dx, dy in directions:
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < self.size and 0 <= ny < self.size:
-                    self.reveal(nx, ny, revealed)
+        flagged = 1 if cells[i] == FLAGGED else 0
+        count = adjacent[i]
+        cells[i] = count
+        if board is not None:
+            board[x][y] = count
+        add((x, y))
+        newly_revealed = 1
+        edges = self._neighbors.edges
+        offsets = self._neighbors.offsets
+        # Cells are revealed as they are pushed, so the board itself marks them as visited
+        stack = [i] if count == 0 else []
+        while stack:
+            i = stack.pop()
+            neighbors = edges.get(i)
+            for n in neighbors if neighbors is not None else [i + offset for offset in offsets]:
+                if cells[n] >= 0:
+                    continue
+                if cells[n] == FLAGGED:
+                    flagged += 1
+                count = adjacent[n]
+                cells[n] = count
+                nx, ny = divmod(n, width)
+                if board is not None:
+                    board[nx][ny] = count
+                add((nx, ny))
+                newly_revealed += 1
+                if count == 0:
+                    stack.append(n)
+        self._flagged_safe -= flagged
+        self._unrevealed_safe -= newly_revealed - flagged
 
     def count_adjacent_bombs(self, x, y):
         """
         Counts the number of bombs adjacent to a given cell in the Minesweeper board.
 
+        The counts of all cells are precomputed when the board is created, so this is a table lookup.
+
         Args:
             x (int): The x-coordinate of the cell.
             y (int): The y-coordinate of the cell.
@@ -190,10 +536,4 @@ class Minesweeper:
         Returns:
             int: The number of adjacent bombs.
         """
-        directions = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
-        count = 0
-        for dx, dy in directions:
-            nx, ny = x + dx, y + dy
-            if 0 <= nx < self.size and 0 <= ny < self.size and self.__board[nx][ny] == 'B':
-                count += 1
-        return count
+        return self.__adjacent[x * self.width + y]
@@ -0,0 +1,100 @@
+import logging
+import time
+
+from utils import Condition
+
+
+class GameObserver:
+    """
+    Base class of the objects that a Minesweeper game notifies after every step.
+
+    Subscribe an observer with Minesweeper.subscribe() and override on_step().
+    """
+
+    def on_step(self, game, action, condition):
+        """
+        Called by the game after an action has been applied.
+
+        Args:
+            game (Minesweeper): The game that performed the action.
+            action (Action): The action that was performed.
+            condition (Condition): The game condition after the action.
+        """
+        pass
+
+
+class ConsolePrinter(GameObserver):
+    def __init__(self, show_board=True):
+        """
+        Prints every action, and optionally the board, to the console.
+
+        Args:
+            show_board (bool, optional): Whether to print the board and the game status after every action. Defaults to True.
+        """
+        self.show_board = show_board
+
+    def on_step(self, game, action, condition):
+        print(f"Action: {action.action_type} at ({action.x}, {action.y})")
+        if not self.show_board:
+            return
+        game.print_board()
+        if condition == Condition.BOMB:
+            print("Game Over! You hit a bomb!")
+        elif condition == Condition.WIN:
+            print("Congratulations! You win!")
+
+
+class TraceLogger(GameObserver):
+    def __init__(self, logger=None, level=logging.DEBUG):
+        """
+        Logs a one-line record of every action through the logging module.
+
+        Args:
+            logger (logging.Logger, optional): The logger to write to. Defaults to the logger of this module.
+            level (int, optional): The logging level of the records. Defaults to logging.DEBUG.
+        """
+        self.logger = logger if logger else logging.getLogger(__name__)
+        self.level = level
+
+    def on_step(self, game, action, condition):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, "%s at (%d, %d) -> %s",
+                            action.action_type.value, action.x, action.y, condition.value)
+
+
+class Throttle(GameObserver):
+    def __init__(self, moves_per_second):
+        """
+        Slows a game down to a maximum number of moves per second, for watching fast agents play.
+
+        The observer sleeps in on_step, so it delays the thread that takes the steps.
+
+        Args:
+            moves_per_second (float): The maximum number of moves per second.
+        """
+        self.interval = 1 / moves_per_second
+        self.next_time = None
+
+    def on_step(self, game, action, condition):
+        now = time.perf_counter()
+        if self.next_time is not None and now < self.next_time:
+            time.sleep(self.next_time - now)
+            now = self.next_time
+        self.next_time = now + self.interval
+
+
+class GameEndHook(GameObserver):
+    def __init__(self, callback):
+        """
+        Calls a function once, after the step that ends the game (a win or a bomb).
+
+        Args:
+            callback (callable): The function, called with the game and its final condition.
+        """
+        self.callback = callback
+        self.called = False
+
+    def on_step(self, game, action, condition):
+        if condition != Condition.IN_PROGRESS and not self.called:
+            self.called = True
+            self.callback(game, condition)
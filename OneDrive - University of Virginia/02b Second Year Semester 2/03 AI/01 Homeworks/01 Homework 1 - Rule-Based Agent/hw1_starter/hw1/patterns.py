@@ -0,0 +1,360 @@
+import struct
+from collections import Counter
+from optparse import OptionParser
+
+from minesweeper import Minesweeper
+from utils import generate_board
+
+# Codes of the cells of a window. Numbers of the 3x3 ring around the center keep their value, and the cells they
+# touch are MINE or UNKNOWN if nothing is known about them. Every other cell, a revealed cell of the outer ring, a
+# cell off the board or a cell that no number of the ring touches, is REVEALED: solve_window() cannot tell them
+# apart, so windows that only differ there share a key.
+REVEALED, MINE, UNKNOWN = 9, 10, 11
+RADIUS = 2
+SIDE = 2 * RADIUS + 1
+OFFSETS = tuple((dx, dy) for dx in range(-RADIUS, RADIUS + 1) for dy in range(-RADIUS, RADIUS + 1))
+CENTER = len(OFFSETS) // 2
+INNER = frozenset(k for k, (dx, dy) in enumerate(OFFSETS) if max(abs(dx), abs(dy)) <= 1 and k != CENTER)
+RING = tuple(sorted(INNER))
+
+
+def _touched():
+    """
+    Lists the cells of a window touched by the numbers of the ring, for every subset of the ring being numbers.
+
+    Returns:
+        list of tuple: For every bit mask of the ring cells that are numbers (bit b for the cell RING[b]), whether each
+                       cell of the window is adjacent to one of them.
+    """
+    touched = []
+    for numbers in range(1 << len(RING)):
+        centers = [OFFSETS[k] for b, k in enumerate(RING) if numbers >> b & 1]
+        touched.append(tuple(any(max(abs(dx - x), abs(dy - y)) == 1 for x, y in centers) for dx, dy in OFFSETS))
+    return touched
+
+
+TOUCHED = _touched()
+# Outcomes of the center cell of a window
+SAFE, BOMB = 1, 2
+
+
+def _symmetries():
+    """
+    Lists the 8 rotations and reflections of a window as permutations of its cells.
+
+    Returns:
+        list of tuple: For every symmetry, the index of the cell of the window that lands on each cell.
+    """
+    transforms = [lambda x, y: (x, y), lambda x, y: (y, -x), lambda x, y: (-x, -y), lambda x, y: (-y, x),
+                  lambda x, y: (x, -y), lambda x, y: (-x, y), lambda x, y: (y, x), lambda x, y: (-y, -x)]
+    position = {offset: k for k, offset in enumerate(OFFSETS)}
+    return [tuple(position[transform(dx, dy)] for dx, dy in OFFSETS) for transform in transforms]
+
+
+SYMMETRIES = _symmetries()
+
+# Persisted tables: a header with the magic bytes, format version, window side and number of records, then one
+# record per canonical window: its cell codes and the outcome of its center
+TABLE_MAGIC = b'MSPT'
+TABLE_VERSION = 2
+TABLE_HEADER = struct.Struct('<4sBBxxI')
+
+
+def canonical(key):
+    """
+    Folds the rotations and reflections of a window together.
+
+    Args:
+        key (bytes): The cell codes of the window, in row-major order.
+
+    Returns:
+        bytes: The smallest of the 8 symmetric variants of the window.
+    """
+    return min(bytes(key[k] for k in permutation) for permutation in SYMMETRIES)
+
+
+def solve_window(key):
+    """
+    Decides the center cell of a window from the numbers around it, by enumerating the bombs of its unknown cells.
+
+    Only the numbers adjacent to the center are used: all their neighbors are in the window, so an outcome forced
+    by them alone holds on the whole board.
+
+    Args:
+        key (bytes): The cell codes of the window, in row-major order.
+
+    Returns:
+        int: SAFE or BOMB if the center is safe or a bomb in every assignment of the unknown cells that satisfies
+             the numbers, None otherwise (or if no assignment does).
+    """
+    constraints = []
+    for k in INNER:
+        value = key[k]
+        if value >= REVEALED:
+            continue
+        x, y = OFFSETS[k]
+        cells = []
+        for dx, dy in OFFSETS:
+            if (dx or dy) and abs(dx) <= 1 and abs(dy) <= 1:
+                n = (x + dx + RADIUS) * SIDE + y + dy + RADIUS
+                if key[n] == MINE:
+                    value -= 1
+                elif key[n] == UNKNOWN:
+                    cells.append(n)
+        constraints.append((cells, value))
+    variables = sorted({n for cells, _ in constraints for n in cells})
+    if CENTER not in variables:
+        return None
+    assignment = {}
+    outcomes = set()
+
+    def consistent():
+        for cells, value in constraints:
+            bombs = unknown = 0
+            for n in cells:
+                if n in assignment:
+                    bombs += assignment[n]
+                else:
+                    unknown += 1
+            if not bombs <= value <= bombs + unknown:
+                return False
+        return True
+
+    def search(index):
+        if len(outcomes) == 2 or not consistent():
+            return
+        if index == len(variables):
+            outcomes.add(assignment[CENTER])
+            return
+        for bomb in (0, 1):
+            assignment[variables[index]] = bomb
+            search(index + 1)
+        del assignment[variables[index]]
+
+    search(0)
+    if len(outcomes) != 1:
+        return None
+    return BOMB if outcomes.pop() else SAFE
+
+
+class PatternTable:
+    def __init__(self, file_path=None):
+        """
+        A lookup table from the 5x5 window of known cells around a frontier cell to whether that cell is safe or a
+        bomb, generated offline by build_table() and saved to a file.
+
+        Windows are stored once per class of rotations and reflections, and every class is expanded to its 8
+        variants in memory, so a lookup is a single dict access on the window as seen on the board.
+
+        Args:
+            file_path (str, optional): The path of a table written by save() to load. Defaults to an empty table.
+
+        Raises:
+            ValueError: If the file is not a pattern table of this version and window size, or is truncated.
+        """
+        self.canonical = {}  # Canonical window -> outcome of its center, as saved
+        self.table = {}  # Every symmetric variant of the windows -> outcome of its center
+        if file_path:
+            with open(file_path, 'rb') as file:
+                data = file.read()
+            if len(data) < TABLE_HEADER.size:
+                raise ValueError(f"{file_path}: truncated, shorter than the {TABLE_HEADER.size}-byte header")
+            magic, version, side, count = TABLE_HEADER.unpack_from(data)
+            if magic != TABLE_MAGIC or version != TABLE_VERSION or side != SIDE:
+                raise ValueError(f"{file_path}: not a pattern table of version {TABLE_VERSION} for {SIDE}x{SIDE} windows")
+            record = len(OFFSETS) + 1
+            if len(data) < TABLE_HEADER.size + count * record:
+                raise ValueError(f"{file_path}: truncated, expected {count} records")
+            for start in range(TABLE_HEADER.size, TABLE_HEADER.size + count * record, record):
+                self.add(data[start:start + record - 1], data[start + record - 1])
+
+    def __len__(self):
+        return len(self.canonical)
+
+    def add(self, key, outcome):
+        """
+        Adds a window and all its symmetric variants to the table.
+
+        Args:
+            key (bytes): The cell codes of the window, in row-major order.
+            outcome (int): SAFE or BOMB.
+        """
+        key = canonical(key)
+        self.canonical[key] = outcome
+        for permutation in SYMMETRIES:
+            self.table[bytes(key[k] for k in permutation)] = outcome
+
+    def lookup(self, key):
+        """
+        Looks up a window.
+
+        Args:
+            key (bytes): The cell codes of the window, in row-major order.
+
+        Returns:
+            int: SAFE or BOMB, or None if the window is not in the table.
+        """
+        return self.table.get(key)
+
+    def save(self, file_path):
+        """
+        Writes the table, one record per canonical window.
+
+        Args:
+            file_path (str): The path of the file to write.
+        """
+        with open(file_path, 'wb') as outfile:
+            outfile.write(TABLE_HEADER.pack(TABLE_MAGIC, TABLE_VERSION, SIDE, len(self.canonical)))
+            outfile.write(b''.join(key + bytes([outcome]) for key, outcome in sorted(self.canonical.items())))
+
+
+class PatternMatcher:
+    def __init__(self, engine, table, counts=None):
+        """
+        Decides the cells around new numbers by looking up their windows in a PatternTable.
+
+        The matcher follows the cells revealed to the engine like inference.SatInference does. The unrevealed
+        neighbors of the numbers revealed since the previous call are the cells whose window changed, and only
+        those are looked up.
+
+        Args:
+            engine (ConstraintEngine): The engine whose knowledge the windows are read from.
+            table (PatternTable): The table, which can be shared by many matchers.
+            counts (Counter, optional): A counter of the canonical windows looked up, used by build_table().
+                                        Defaults to None.
+        """
+        self.engine = engine
+        self.table = table
+        self.counts = counts
+        self.seen = 0  # Number of cells of engine.revealed already visited
+        self.rows, self.cols = engine.size, engine.width
+        # Flat index offsets of the cells of the window
+        self.offsets = tuple(dx * self.cols + dy for dx, dy in OFFSETS)
+
+    def key(self, i):
+        """
+        Reads the window around a cell from the knowledge of the engine, keeping only what solve_window() reads.
+
+        Args:
+            i (int): The flat index of the cell.
+
+        Returns:
+            bytes: The cell codes of the window, in row-major order.
+        """
+        engine = self.engine
+        values, mines = engine.values, engine.mines
+        rows, cols = self.rows, self.cols
+        x, y = divmod(i, cols)
+        # Away from the edges, every cell of the window is on the board
+        inside = RADIUS <= x < rows - RADIUS and RADIUS <= y < cols - RADIUS
+        codes = bytearray([REVEALED]) * len(OFFSETS)
+        # The numbers of the ring decide which cells of the window matter
+        numbers = 0
+        for b, k in enumerate(RING):
+            dx, dy = OFFSETS[k]
+            if inside or (0 <= x + dx < rows and 0 <= y + dy < cols):
+                value = values[i + self.offsets[k]]
+                if value is not None:
+                    codes[k] = value
+                    numbers |= 1 << b
+        for k, touched in enumerate(TOUCHED[numbers]):
+            if touched and codes[k] == REVEALED:
+                dx, dy = OFFSETS[k]
+                n = i + self.offsets[k]
+                if (inside or (0 <= x + dx < rows and 0 <= y + dy < cols)) and values[n] is None:
+                    codes[k] = MINE if n in mines else UNKNOWN
+        return bytes(codes)
+
+    def deduce(self):
+        """
+        Looks up the windows of the cells next to the numbers revealed since the previous call that nothing is
+        known about yet.
+
+        Returns:
+            tuple: The lists of the flat indices of the cells found safe and of the cells found to be bombs.
+        """
+        engine = self.engine
+        values = engine.values
+        cells = set()
+        for i in engine.revealed[self.seen:]:
+            if values[i]:
+                cells.update(engine.adjacent.neighbors(i))
+        self.seen = len(engine.revealed)
+        safe, mines = [], []
+        lookup = self.table.table.get
+        for i in cells:
+            if not engine.is_unknown(i):
+                continue
+            key = self.key(i)
+            if self.counts is not None:
+                self.counts[canonical(key)] += 1
+            outcome = lookup(key)
+            if outcome == SAFE:
+                safe.append(i)
+            elif outcome == BOMB:
+                mines.append(i)
+        return safe, mines
+
+
+def build_table(games=200, size=30, bombs=150, seed=0, min_count=2):
+    """
+    Generates a pattern table from the windows met by RuleBasedAgent in games on random boards.
+
+    The agent plays with an empty table, and the windows it looks up are counted. The windows
+    met at least min_count times are then solved with solve_window(), and those with a forced center are kept.
+
+    Args:
+        games (int, optional): The number of games. Defaults to 200.
+        size (int, optional): The size of the boards (size x size). Defaults to 30.
+        bombs (int, optional): The number of bombs on the boards. Defaults to 150.
+        seed (int, optional): The seed of the first board, game i using seed + i. Defaults to 0.
+        min_count (int, optional): The number of times a window must be met to be solved. Defaults to 2.
+
+    Returns:
+        PatternTable: The table.
+    """
+    from agent import RuleBasedAgent
+
+    counts = Counter()
+    for i in range(games):
+        game = Minesweeper(size=size, bomb_map=generate_board(size, bombs, seed=seed + i), quiet=True, compact=True)
+        agent = RuleBasedAgent(game, patterns=PatternTable())
+        agent.patterns.counts = counts
+        agent.play()
+    table = PatternTable()
+    for key, count in counts.items():
+        if count >= min_count:
+            outcome = solve_window(key)
+            if outcome is not None:
+                table.add(key, outcome)
+    return table
+
+
+def main():
+    """
+    Main function to parse command-line options and generate a pattern table, see PatternTable.
+
+    Command-line options:
+    -o, --output: Path of the table file to write
+    -g, --games: Number of games to collect the windows from
+    -s, --size: Size of the boards (size x size)
+    -b, --bombs: Number of bombs on the boards
+    --seed: Seed of the first board
+    --min-count: Number of times a window must be met to be kept
+    """
+    parser = OptionParser()
+    parser.add_option("-o", "--output", dest="output", default="patterns.tbl", help="Path of the table file to write")
+    parser.add_option("-g", "--games", dest="games", type="int", default=200, help="Number of games to collect the windows from")
+    parser.add_option("-s", "--size", dest="size", type="int", default=30, help="Size of the boards (size x size)")
+    parser.add_option("-b", "--bombs", dest="bombs", type="int", default=150, help="Number of bombs on the boards")
+    parser.add_option("--seed", dest="seed", type="int", default=0, help="Seed of the first board")
+    parser.add_option("--min-count", dest="min_count", type="int", default=2, help="Number of times a window must be met to be kept")
+
+    (options, args) = parser.parse_args()
+
+    table = build_table(options.games, options.size, options.bombs, options.seed, options.min_count)
+    table.save(options.output)
+    print(f"Wrote {len(table)} patterns to {options.output}")
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,13 @@ import os
 import threading
 from optparse import OptionParser
 from minesweeper import Minesweeper
+from chunked_board import ChunkedMinesweeper
 from agent import ManualGuiAgent, RuleBasedAgent
-from utils import read_bomb_map
+from game_trace import TraceRecorder
+from observers import GameEndHook, Throttle
+from patterns import PatternTable
+from profiling import StepProfiler
+from utils import PackedBombMap, bomb_map_width, read_bomb_map
 
 def main():
     """
@@ -12,13 +17,67 @@ def main():
     Command-line options:
     -a, --agent: Type of agent to use (manual or rule_based)
     -m, --map: Path to the bomb map file
+    -g, --gui: Display to use (buttons or canvas), the manual agent defaults to buttons
+    --fps: Maximum number of display refreshes per second
+    --speed: Maximum number of moves per second of the agent, 0 for full speed
+    -r, --record: Path of a trace file to record the game to, see replay.py
+    --profile: Path of a JSON file to write the per-step timings and counters to
+    --chrome-trace: Path of a file to write the per-step timings to, in the Chrome trace format
+    --patterns: Path of a pattern table for the rule-based agent, see patterns.py
+    --sat: Let the rule-based agent prove cells with the SAT solver before guessing
+    --chunked: Size of a lazily generated board to play manually instead of a bomb map (ROWSxCOLUMNS)
+    --density: Fraction of the cells of a chunked board that contain a bomb
+    --seed: Seed of a chunked board
     """
     parser = OptionParser()
     parser.add_option("-a", "--agent", dest="agent_type", help="Type of agent to use (manual or rule_based)")
     parser.add_option("-m", "--map", dest="bomb_map_file", help="Path to the bomb map file")
+    parser.add_option("-g", "--gui", dest="gui", help="Display to use (buttons or canvas), the manual agent defaults to buttons")
+    parser.add_option("--fps", dest="fps", type="int", default=30, help="Maximum number of display refreshes per second")
+    parser.add_option("--speed", dest="speed", type="float", default=0, help="Maximum number of moves per second of the agent, 0 for full speed")
+
+    parser.add_option("-r", "--record", dest="trace_file", help="Path of a trace file to record the game to, see replay.py")
+    parser.add_option("--profile", dest="profile_file", help="Path of a JSON file to write the per-step timings and counters to")
+    parser.add_option("--chrome-trace", dest="chrome_trace_file", help="Path of a file to write the per-step timings to, in the Chrome trace format")
+
+    parser.add_option("--patterns", dest="pattern_file", help="Path of a pattern table for the rule-based agent, see patterns.py")
+    parser.add_option("--sat", dest="sat", action="store_true", default=False, help="Let the rule-based agent prove cells with the SAT solver before guessing")
+    parser.add_option("--chunked", dest="chunked", help="Size of a lazily generated board to play manually instead of a bomb map (ROWSxCOLUMNS)")
+    parser.add_option("--density", dest="density", type="float", default=0.15, help="Fraction of the cells of a chunked board that contain a bomb")
+    parser.add_option("--seed", dest="seed", type="int", default=0, help="Seed of a chunked board")
 
     (options, args) = parser.parse_args()
 
+    if options.chunked:
+        try:
+            height, width = (int(n) for n in options.chunked.lower().split('x'))
+        except ValueError:
+            print("Invalid board size. Use ROWSxCOLUMNS, such as 100000x100000.")
+            return
+        if options.trace_file:
+            print("Traces cannot record chunked boards, whose bombs are not stored in a bomb map.")
+            return
+        # Chunked boards are too large for the agents, they are played through the scrolling canvas
+        game = ChunkedMinesweeper(height, width, density=options.density, seed=options.seed, gui=True)
+        game.gui.fps = options.fps
+        print(f"{height}x{width} board with {game.bombs} bombs")
+        profiler = StepProfiler(game) if options.profile_file or options.chrome_trace_file else None
+        if profiler:
+            finished = threading.Lock()
+
+            def finish(*args):
+                if finished.acquire(blocking=False):
+                    if options.profile_file:
+                        profiler.write_json(options.profile_file)
+                    if options.chrome_trace_file:
+                        profiler.write_chrome_trace(options.chrome_trace_file)
+
+            game.subscribe(GameEndHook(lambda game, condition: game.gui.root.after(0, finish)))
+        game.gui.start_gui()
+        if profiler:
+            finish()
+        return
+
     if not options.agent_type or not options.bomb_map_file:
         parser.print_help()
         return
@@ -30,19 +89,63 @@ def main():
         print(f"Error: The bomb map file '{bomb_map_file}' does not exist.")
         return
 
+    if options.gui not in (None, "buttons", "canvas"):
+        print("Unknown display. Use 'buttons' or 'canvas'.")
+        return
+    gui = "canvas" if options.gui == "canvas" else options.gui is not None
+
     bomb_map = read_bomb_map(bomb_map_file)
 
     if agent_type == "manual":
-        game = Minesweeper(size=len(bomb_map), bomb_map=bomb_map, gui=True)
+        game = Minesweeper(size=len(bomb_map), bomb_map=bomb_map, gui=gui or True, width=bomb_map_width(bomb_map))
         agent = ManualGuiAgent(game)
     elif agent_type == "rule_based":
-        game = Minesweeper(size=len(bomb_map), bomb_map=bomb_map)
-        agent = RuleBasedAgent(game)
+        game = Minesweeper(size=len(bomb_map), bomb_map=bomb_map, gui=gui, width=bomb_map_width(bomb_map))
+        patterns = PatternTable(options.pattern_file) if options.pattern_file else None
+        agent = RuleBasedAgent(game, sat=options.sat, patterns=patterns)
     else:
         print("Unknown agent type. Use 'manual' or 'rule_based'.")
         return
+    if isinstance(bomb_map, PackedBombMap):
+        bomb_map.close()  # The game holds its own copy of the cells
+    if game.gui:
+        # The agent thread only posts updates, the Tk main loop redraws at most fps times per second
+        game.gui.fps = options.fps
+    if options.speed > 0:
+        game.subscribe(Throttle(options.speed))
+
+    try:
+        recorder = TraceRecorder(game, options.trace_file) if options.trace_file else None
+    except ValueError as error:
+        print(f"Error: {error}")
+        return
+    profiler = StepProfiler(game) if options.profile_file or options.chrome_trace_file else None
+    finished = threading.Lock()
+
+    def finish():
+        # Runs once, when the game ends or its window is closed, whichever comes first
+        if not finished.acquire(blocking=False):
+            return
+        if recorder:
+            recorder.close()
+        if profiler:
+            if options.profile_file:
+                profiler.write_json(options.profile_file)
+            if options.chrome_trace_file:
+                profiler.write_chrome_trace(options.chrome_trace_file)
+
+    if agent_type == "manual":
+        # The manual agent plays from the Tk main loop: finish once the step that ends the game has returned
+        game.subscribe(GameEndHook(lambda game, condition: game.gui.root.after(0, finish)))
+        game.gui.start_gui()
+        finish()
+        return
+
+    def play():
+        agent.play()
+        finish()
 
-    agent_thread = threading.Thread(target=agent.play)
+    agent_thread = threading.Thread(target=play, daemon=bool(game.gui))
     agent_thread.start()
     if game.gui:
         game.gui.start_gui()
@@ -0,0 +1,217 @@
+import json
+import os
+import time
+
+from utils import ActionType, Condition
+
+
+def _stats(durations):
+    """
+    Summarizes a list of durations.
+
+    Args:
+        durations (list of float): The durations, in seconds.
+
+    Returns:
+        dict: The count, and the total (ms), mean (µs) and maximum (µs) durations.
+    """
+    if not durations:
+        return {'count': 0, 'total_ms': 0.0, 'mean_us': None, 'max_us': None}
+    total = sum(durations)
+    return {'count': len(durations), 'total_ms': total * 1e3,
+            'mean_us': total / len(durations) * 1e6, 'max_us': max(durations) * 1e6}
+
+
+class StepProfiler:
+    def __init__(self, game=None, clock=time.perf_counter):
+        """
+        Records the timings and counters of every step of a game, to find where the time goes.
+
+        Once attached to a game, Minesweeper.step and step_many record the time spent updating the board
+        (reveal and flood fill), testing the goal and notifying the observers (console, GUI...), and the cells
+        changed by every step. Agent.play records the latency of every decision, and RuleBasedAgent counts its
+        guesses and solver calls. A game without a profiler only pays for an attribute check per step.
+
+        The records can be summarized with summary(), and exported with write_json() or, to inspect the steps
+        on a timeline in chrome://tracing or Perfetto, with write_chrome_trace().
+
+        Args:
+            game (Minesweeper, optional): The game to attach to. Defaults to None.
+            clock (callable, optional): The clock, returning seconds. Defaults to time.perf_counter.
+        """
+        self.clock = clock
+        self.origin = clock()
+        self.game = None
+        # (action type, x, y, condition, changed cells, actions, start, applied, tested, end) of every step
+        self.steps = []
+        # (start, end) of every decision of the agent
+        self.decisions = []
+        self.counters = {}
+        if game is not None:
+            self.attach(game)
+
+    def attach(self, game):
+        """
+        Starts recording the steps of a game.
+
+        Args:
+            game (Minesweeper): The game.
+        """
+        self.game = game
+        game.profiler = self
+
+    def detach(self):
+        """
+        Stops recording the steps of the game the profiler is attached to.
+        """
+        if self.game is not None and self.game.profiler is self:
+            self.game.profiler = None
+        self.game = None
+
+    def count(self, name, n=1):
+        """
+        Increments a counter.
+
+        Args:
+            name (str): The name of the counter.
+            n (int, optional): The increment. Defaults to 1.
+        """
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def record_decision(self, start, end):
+        """
+        Records a call to the get_next_action method of an agent. Called by Agent.play.
+
+        Args:
+            start (float): The clock time before the call.
+            end (float): The clock time after the call.
+        """
+        self.decisions.append((start, end))
+
+    def record_step(self, action, condition, changed, start, applied, tested, end, actions=1):
+        """
+        Records a step of the game. Called by Minesweeper.step and step_many.
+
+        Args:
+            action (Action): The action, the last applied one for a batch.
+            condition (Condition): The condition of the game after the step.
+            changed (int): The number of cells changed by the step.
+            start (float): The clock time at the start of the step.
+            applied (float): The clock time after the board was updated.
+            tested (float): The clock time after the goal test.
+            end (float): The clock time after the observers were notified.
+            actions (int, optional): The number of actions of a batch. Defaults to 1.
+        """
+        self.steps.append((action.action_type, action.x, action.y, condition, changed, actions,
+                           start, applied, tested, end))
+
+    def revealed_per_step(self):
+        """
+        Lists the number of cells revealed by every step: the flood-filled region of a safe reveal, and 0 for flags,
+        bombs and actions on revealed cells.
+
+        Returns:
+            list of int: The number of cells revealed by every step.
+        """
+        return [changed if action_type == ActionType.REVEAL and condition != Condition.BOMB else 0
+                for action_type, _, _, condition, changed, *_ in self.steps]
+
+    def summary(self):
+        """
+        Summarizes the records.
+
+        Returns:
+            dict: The number of steps and actions, the statistics of every phase (decide, apply, goal_test,
+                  notify and the whole step), the cells revealed per step, the flood fills (reveals that opened
+                  more than one cell) and the counters.
+        """
+        steps = self.steps
+        phases = {
+            'decide': _stats([end - start for start, end in self.decisions]),
+            'apply': _stats([step[7] - step[6] for step in steps]),
+            'goal_test': _stats([step[8] - step[7] for step in steps]),
+            'notify': _stats([step[9] - step[8] for step in steps]),
+            'step': _stats([step[9] - step[6] for step in steps]),
+        }
+        revealed = self.revealed_per_step()
+        floods = [n for n in revealed if n > 1]
+        return {
+            'steps': len(steps),
+            'actions': sum(step[5] for step in steps),
+            'phases': phases,
+            'revealed_per_step': {'total': sum(revealed), 'mean': sum(revealed) / len(revealed) if revealed else None,
+                                  'max': max(revealed, default=None)},
+            'flood_fills': {'count': len(floods), 'mean_size': sum(floods) / len(floods) if floods else None,
+                            'max_size': max(floods, default=None)},
+            'counters': dict(self.counters),
+        }
+
+    def to_dict(self):
+        """
+        Returns the summary and the record of every step, with the times in microseconds since the profiler started.
+
+        Returns:
+            dict: The summary (see summary()), the steps and the decisions.
+        """
+        def us(t):
+            return round((t - self.origin) * 1e6, 3)
+
+        return {
+            'summary': self.summary(),
+            'steps': [{'action': action_type.value, 'x': x, 'y': y, 'condition': condition.value, 'changed': changed,
+                       'actions': actions, 'start_us': us(start), 'apply_us': us(applied) - us(start),
+                       'goal_test_us': us(tested) - us(applied), 'notify_us': us(end) - us(tested)}
+                      for action_type, x, y, condition, changed, actions, start, applied, tested, end in self.steps],
+            'decisions': [{'start_us': us(start), 'duration_us': us(end) - us(start)} for start, end in self.decisions],
+        }
+
+    def write_json(self, file_path):
+        """
+        Writes the records as JSON (see to_dict()).
+
+        Args:
+            file_path (str): The path of the file to write.
+        """
+        with open(file_path, 'w') as outfile:
+            json.dump(self.to_dict(), outfile, indent=1)
+
+    def chrome_trace(self):
+        """
+        Converts the records to the Chrome trace event format: one complete event per decision and per step,
+        with the phases of every step nested inside it, and a counter of the revealed cells.
+
+        Returns:
+            dict: The trace, with its list of events under 'traceEvents'.
+        """
+        pid = os.getpid()
+        events = []
+
+        def event(name, start, end, tid, args=None):
+            events.append({'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+                           'ts': (start - self.origin) * 1e6, 'dur': (end - start) * 1e6, 'args': args or {}})
+
+        for start, end in self.decisions:
+            event('decide', start, end, 1)
+        total = 0
+        for (action_type, x, y, condition, changed, actions, start, applied, tested, end), revealed in \
+                zip(self.steps, self.revealed_per_step()):
+            event('step', start, end, 1, {'action': action_type.value, 'x': x, 'y': y, 'condition': condition.value,
+                                          'changed': changed, 'actions': actions})
+            event('apply', start, applied, 1)
+            event('goal_test', applied, tested, 1)
+            event('notify', tested, end, 1)
+            total += revealed
+            events.append({'name': 'revealed', 'ph': 'C', 'pid': pid, 'tid': 1,
+                           'ts': (end - self.origin) * 1e6, 'args': {'cells': total}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'counters': dict(self.counters)}}
+
+    def write_chrome_trace(self, file_path):
+        """
+        Writes the records in the Chrome trace event format (see chrome_trace()), which chrome://tracing and
+        Perfetto can open.
+
+        Args:
+            file_path (str): The path of the file to write.
+        """
+        with open(file_path, 'w') as outfile:
+            json.dump(self.chrome_trace(), outfile)
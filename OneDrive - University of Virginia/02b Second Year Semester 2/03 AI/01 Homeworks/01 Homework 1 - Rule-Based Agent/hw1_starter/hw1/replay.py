@@ -0,0 +1,81 @@
+import os
+import threading
+import time
+from optparse import OptionParser
+from game_trace import Replayer
+from observers import Throttle
+from utils import PackedBombMap, read_bomb_map
+
+def main():
+    """
+    Main function to parse command-line options and replay a trace recorded with game_trace.TraceRecorder.
+
+    Without a display, replays the trace at full speed and checks that the game ends as it did when it was
+    recorded. With a display, replays the trace move by move.
+
+    Command-line options:
+    -t, --trace: Path to the trace file
+    -m, --map: Path to the bomb map file, required if the trace has no board seed
+    -g, --gui: Display to replay through (buttons or canvas)
+    --seek: Number of moves to skip before replaying
+    --speed: Maximum number of moves per second through the display, 0 for full speed
+    --fps: Maximum number of display refreshes per second
+    """
+    parser = OptionParser()
+    parser.add_option("-t", "--trace", dest="trace_file", help="Path to the trace file")
+    parser.add_option("-m", "--map", dest="bomb_map_file", help="Path to the bomb map file, required if the trace has no board seed")
+    parser.add_option("-g", "--gui", dest="gui", help="Display to replay through (buttons or canvas)")
+    parser.add_option("--seek", dest="seek", type="int", default=0, help="Number of moves to skip before replaying")
+    parser.add_option("--speed", dest="speed", type="float", default=10, help="Maximum number of moves per second through the display, 0 for full speed")
+    parser.add_option("--fps", dest="fps", type="int", default=30, help="Maximum number of display refreshes per second")
+
+    (options, args) = parser.parse_args()
+
+    if not options.trace_file:
+        parser.print_help()
+        return
+    for path in (options.trace_file, options.bomb_map_file):
+        if path and not os.path.exists(path):
+            print(f"Error: The file '{path}' does not exist.")
+            return
+    if options.gui not in (None, "buttons", "canvas"):
+        print("Unknown display. Use 'buttons' or 'canvas'.")
+        return
+
+    bomb_map = read_bomb_map(options.bomb_map_file) if options.bomb_map_file else None
+    gui = "canvas" if options.gui == "canvas" else options.gui is not None
+    try:
+        replayer = Replayer(options.trace_file, bomb_map=bomb_map, gui=gui)
+    except ValueError as error:
+        print(f"Error: {error}")
+        return
+    finally:
+        if isinstance(bomb_map, PackedBombMap):
+            bomb_map.close()  # The game holds its own copy of the cells
+    trace = replayer.trace
+    print(f"Trace of {len(trace)} moves on a {trace.size}x{trace.size} board with {trace.bombs} bombs, "
+          f"recorded result: {trace.condition.value if trace.condition else 'unfinished'}")
+
+    condition = replayer.seek(min(options.seek, len(trace)))
+    game = replayer.game
+    if game.gui:
+        game.gui.fps = options.fps
+        game.gui.update_gui(condition, full=True)
+        if options.speed > 0:
+            game.subscribe(Throttle(options.speed))
+        threading.Thread(target=lambda: print(f"Result: {replayer.play().value}"), daemon=True).start()
+        game.gui.start_gui()
+        return
+
+    start = time.perf_counter()
+    condition = replayer.run()
+    print(f"Replayed in {time.perf_counter() - start:.3f}s, result: {condition.value}")
+    if trace.condition is None:
+        print("The trace was not closed, the result cannot be checked.")
+    elif condition == trace.condition:
+        print("The replay matches the recorded result.")
+    else:
+        print("MISMATCH: the replay does not end as the recorded game.")
+
+if __name__ == "__main__":
+    main()
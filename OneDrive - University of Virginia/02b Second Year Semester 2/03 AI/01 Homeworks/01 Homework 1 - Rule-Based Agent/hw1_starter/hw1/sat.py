@@ -0,0 +1,423 @@
+import heapq
+
+
+def luby(i):
+    """
+    Returns the i-th term (from 0) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, ..., used to space the restarts.
+
+    Args:
+        i (int): The index of the term.
+
+    Returns:
+        int: The term.
+    """
+    size, exponent = 1, 0
+    while size < i + 1:
+        exponent += 1
+        size = 2 * size + 1
+    while size - 1 != i:
+        size = (size - 1) // 2
+        exponent -= 1
+        i %= size
+    return 1 << exponent
+
+
+class CDCLSolver:
+    def __init__(self, max_learned=20000, restart_interval=100, decay=0.95):
+        """
+        A small incremental SAT solver using conflict-driven clause learning.
+
+        Variables are positive integers created with new_var(), and a literal is a variable (true) or its negation
+        (false). Clauses are added with add_clause() between calls to solve(), which can be given assumptions:
+        literals that are assumed true for that call only. The clauses learned from conflicts only depend on the
+        clauses, not on the assumptions, so they are kept from one call to the next and later calls start from
+        everything learned before. When there are more than max_learned of them, the older half of the learned
+        clauses with more than two literals is dropped at the next restart.
+
+        The search uses two watched literals per clause for unit propagation, first-UIP conflict analysis with
+        non-chronological backtracking, VSIDS decisions with phase saving (a variable is first tried false) and
+        Luby restarts.
+
+        Args:
+            max_learned (int, optional): The number of learned clauses that triggers a clean-up. Defaults to 20000.
+            restart_interval (int, optional): The number of conflicts of a unit of the restart sequence. Defaults to 100.
+            decay (float, optional): The decay of the variable activities after every conflict. Defaults to 0.95.
+        """
+        self.max_learned = max_learned
+        self.restart_interval = restart_interval
+        self.decay = decay
+        self.num_vars = 0
+        # Per variable, index 0 unused: value (1 true, -1 false, 0 unassigned), decision level, reason clause,
+        # activity and saved phase
+        self.values = [0]
+        self.levels = [0]
+        self.reasons = [None]
+        self.activity = [0.0]
+        self.phase = [False]
+        self.seen = bytearray(1)
+        # Clauses watching each literal, literal l at index 2l and -l at index 2l + 1
+        self.watches = [[], []]
+        self.clauses = []
+        self.learned = []
+        self.trail = []  # Assigned literals in assignment order
+        self.trail_lim = []  # Start of every decision level in the trail
+        self.qhead = 0  # Next literal of the trail to propagate
+        self.heap = []  # (-activity, variable) entries, possibly stale, of the decision candidates
+        self.var_inc = 1.0
+        self.ok = True  # False once the clauses are unsatisfiable whatever the assumptions
+        self.model = None
+        self.conflicts = 0
+        self.decisions = 0
+        self.restarts = 0
+
+    def new_var(self):
+        """
+        Creates a variable.
+
+        Returns:
+            int: The variable.
+        """
+        self.num_vars += 1
+        v = self.num_vars
+        self.values.append(0)
+        self.levels.append(0)
+        self.reasons.append(None)
+        self.activity.append(0.0)
+        self.phase.append(False)
+        self.seen.append(0)
+        self.watches.append([])
+        self.watches.append([])
+        heapq.heappush(self.heap, (0.0, v))
+        return v
+
+    def value(self, lit):
+        """
+        Returns the current value of a literal.
+
+        Args:
+            lit (int): The literal.
+
+        Returns:
+            int: 1 if the literal is true, -1 if it is false, 0 if its variable is unassigned.
+        """
+        return self.values[lit] if lit > 0 else -self.values[-lit]
+
+    def add_clause(self, lits):
+        """
+        Adds a clause, the disjunction of some literals.
+
+        Args:
+            lits (iterable of int): The literals.
+
+        Returns:
+            bool: False if the clauses have become unsatisfiable.
+        """
+        self._backtrack(0)
+        if not self.ok:
+            return False
+        clause = []
+        for lit in lits:
+            value = self.value(lit)
+            if value == 1 or -lit in clause:
+                return True  # Satisfied for good, or a tautology
+            if value == 0 and lit not in clause:
+                clause.append(lit)
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self._enqueue(clause[0], None)
+            self.ok = self._propagate() is None
+        else:
+            self.clauses.append(clause)
+            self._attach(clause)
+        return self.ok
+
+    def solve(self, assumptions=(), max_conflicts=None):
+        """
+        Searches for an assignment of the variables that satisfies every clause and assumption.
+
+        Args:
+            assumptions (sequence of int, optional): Literals assumed true for this call. Defaults to none.
+            max_conflicts (int, optional): The number of conflicts after which the search gives up. Defaults to no limit.
+
+        Returns:
+            bool: True if the clauses are satisfiable under the assumptions, with the assignment in model (indexed by
+                  variable, 1 true and -1 false), False if they are not, and None if the search gave up.
+        """
+        if not self.ok:
+            return False
+        self._backtrack(0)
+        if self._propagate() is not None:
+            self.ok = False
+            return False
+        conflicts = 0
+        restarts = 0
+        restart_at = luby(restarts) * self.restart_interval
+        while True:
+            conflict = self._propagate()
+            if conflict is not None:
+                conflicts += 1
+                self.conflicts += 1
+                if not self.trail_lim:
+                    self.ok = False
+                    return False
+                learnt, level = self._analyze(conflict)
+                self._backtrack(level)
+                if len(learnt) == 1:
+                    self._enqueue(learnt[0], None)
+                else:
+                    self.learned.append(learnt)
+                    self._attach(learnt)
+                    self._enqueue(learnt[0], learnt)
+                self.var_inc /= self.decay
+                if max_conflicts is not None and conflicts >= max_conflicts:
+                    self._backtrack(0)
+                    return None
+                continue
+            if conflicts >= restart_at:
+                self._backtrack(0)
+                self.restarts += 1
+                restarts += 1
+                restart_at = conflicts + luby(restarts) * self.restart_interval
+                if len(self.learned) > self.max_learned:
+                    self._reduce()
+            level = len(self.trail_lim)
+            if level < len(assumptions):
+                lit = assumptions[level]
+                value = self.value(lit)
+                if value == -1:
+                    self._backtrack(0)
+                    return False
+                self.trail_lim.append(len(self.trail))
+                if value == 0:
+                    self._enqueue(lit, None)
+                continue
+            v = self._pick()
+            if v is None:
+                self.model = self.values[:]
+                self._backtrack(0)
+                return True
+            self.decisions += 1
+            self.trail_lim.append(len(self.trail))
+            self._enqueue(v if self.phase[v] else -v, None)
+
+    def _attach(self, clause):
+        for lit in clause[:2]:
+            self.watches[2 * lit if lit > 0 else 1 - 2 * lit].append(clause)
+
+    def _enqueue(self, lit, reason):
+        v = lit if lit > 0 else -lit
+        self.values[v] = 1 if lit > 0 else -1
+        self.levels[v] = len(self.trail_lim)
+        self.reasons[v] = reason
+        self.trail.append(lit)
+
+    def _propagate(self):
+        """
+        Assigns the literals implied by the assigned ones until nothing more is implied.
+
+        Returns:
+            list: A clause whose literals are all false, or None if there is no conflict.
+        """
+        values = self.values
+        watches = self.watches
+        trail = self.trail
+        while self.qhead < len(trail):
+            false_lit = -trail[self.qhead]
+            self.qhead += 1
+            ws = watches[2 * false_lit if false_lit > 0 else 1 - 2 * false_lit]
+            i = j = 0
+            n = len(ws)
+            while i < n:
+                clause = ws[i]
+                i += 1
+                if not clause:
+                    continue  # Dropped by _reduce
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], false_lit
+                first = clause[0]
+                first_value = values[first] if first > 0 else -values[-first]
+                if first_value == 1:
+                    ws[j] = clause
+                    j += 1
+                    continue
+                for k in range(2, len(clause)):
+                    lit = clause[k]
+                    if (values[lit] if lit > 0 else -values[-lit]) != -1:
+                        clause[1], clause[k] = lit, false_lit
+                        watches[2 * lit if lit > 0 else 1 - 2 * lit].append(clause)
+                        break
+                else:
+                    ws[j] = clause
+                    j += 1
+                    if first_value == -1:
+                        ws[j:] = ws[i:n]
+                        self.qhead = len(trail)
+                        return clause
+                    self._enqueue(first, clause)
+            del ws[j:]
+        return None
+
+    def _analyze(self, conflict):
+        """
+        Derives the first-UIP clause of a conflict.
+
+        Returns:
+            tuple: The learned clause, whose first literal is the one it asserts and second literal the one of
+                   the highest level among the others, and the level to backtrack to.
+        """
+        seen = self.seen
+        levels = self.levels
+        trail = self.trail
+        current = len(self.trail_lim)
+        learnt = [0]
+        pending = 0
+        index = len(trail) - 1
+        clause = conflict
+        lit = None
+        while True:
+            for q in (clause if lit is None else clause[1:]):
+                v = q if q > 0 else -q
+                if not seen[v] and levels[v] > 0:
+                    seen[v] = 1
+                    self._bump(v)
+                    if levels[v] >= current:
+                        pending += 1
+                    else:
+                        learnt.append(q)
+            while not seen[abs(trail[index])]:
+                index -= 1
+            lit = trail[index]
+            index -= 1
+            v = abs(lit)
+            seen[v] = 0
+            pending -= 1
+            if not pending:
+                break
+            clause = self.reasons[v]
+        learnt[0] = -lit
+        for q in learnt[1:]:
+            seen[abs(q)] = 0
+        if len(learnt) == 1:
+            return learnt, 0
+        best = max(range(1, len(learnt)), key=lambda k: levels[abs(learnt[k])])
+        learnt[1], learnt[best] = learnt[best], learnt[1]
+        return learnt, levels[abs(learnt[1])]
+
+    def _backtrack(self, level):
+        if len(self.trail_lim) <= level:
+            return
+        start = self.trail_lim[level]
+        for lit in self.trail[start:]:
+            v = lit if lit > 0 else -lit
+            self.values[v] = 0
+            self.reasons[v] = None
+            self.phase[v] = lit > 0
+            heapq.heappush(self.heap, (-self.activity[v], v))
+        del self.trail[start:]
+        del self.trail_lim[level:]
+        self.qhead = start
+        if len(self.heap) > 4 * self.num_vars + 100:
+            self.heap = [(-self.activity[v], v) for v in range(1, self.num_vars + 1) if not self.values[v]]
+            heapq.heapify(self.heap)
+
+    def _bump(self, v):
+        self.activity[v] += self.var_inc
+        if self.activity[v] > 1e100:
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.var_inc *= 1e-100
+            self.heap = [(-self.activity[u], u) for u in range(1, self.num_vars + 1) if not self.values[u]]
+            heapq.heapify(self.heap)
+        elif not self.values[v]:
+            heapq.heappush(self.heap, (-self.activity[v], v))
+
+    def _pick(self):
+        while self.heap:
+            v = heapq.heappop(self.heap)[1]
+            if not self.values[v]:
+                return v
+        return None
+
+    def _reduce(self):
+        """
+        Drops the older half of the learned clauses with more than two literals. Called at decision level 0, where
+        no reason clause is ever read again.
+        """
+        keep = []
+        long_clauses = [clause for clause in self.learned if len(clause) > 2]
+        dropped = set(map(id, long_clauses[:len(long_clauses) // 2]))
+        for clause in self.learned:
+            if id(clause) in dropped:
+                clause.clear()  # Unwatched lazily by _propagate
+            else:
+                keep.append(clause)
+        self.learned = keep
+
+
+def at_most(solver, lits, k):
+    """
+    Adds clauses stating that at most k of the literals are true.
+
+    The general case uses the sequential counter encoding (Sinz, 2005): with n literals, (n - 1) * k auxiliary
+    variables count the true literals among the first ones and O(n * k) clauses keep the count below k + 1, so
+    that unit propagation alone enforces the bound. The cases k = 0 and k = n - 1 only need unit clauses and a
+    single clause.
+
+    Args:
+        solver (CDCLSolver): The solver.
+        lits (sequence of int): The literals.
+        k (int): The bound.
+    """
+    n = len(lits)
+    if k >= n:
+        return
+    if k < 0:
+        solver.add_clause([])
+        return
+    if k == 0:
+        for lit in lits:
+            solver.add_clause([-lit])
+        return
+    if k == n - 1:
+        solver.add_clause([-lit for lit in lits])
+        return
+    # counts[j] is true when at least j + 1 of the literals seen so far are true
+    counts = [solver.new_var() for _ in range(k)]
+    solver.add_clause([-lits[0], counts[0]])
+    for j in range(1, k):
+        solver.add_clause([-counts[j]])
+    for i in range(1, n - 1):
+        previous = counts
+        counts = [solver.new_var() for _ in range(k)]
+        solver.add_clause([-lits[i], counts[0]])
+        solver.add_clause([-previous[0], counts[0]])
+        for j in range(1, k):
+            solver.add_clause([-lits[i], -previous[j - 1], counts[j]])
+            solver.add_clause([-previous[j], counts[j]])
+        solver.add_clause([-lits[i], -previous[k - 1]])
+    solver.add_clause([-lits[n - 1], -counts[k - 1]])
+
+
+def at_least(solver, lits, k):
+    """
+    Adds clauses stating that at least k of the literals are true, as at most n - k of their negations.
+
+    Args:
+        solver (CDCLSolver): The solver.
+        lits (sequence of int): The literals.
+        k (int): The bound.
+    """
+    at_most(solver, [-lit for lit in lits], len(lits) - k)
+
+
+def exactly(solver, lits, k):
+    """
+    Adds clauses stating that exactly k of the literals are true.
+
+    Args:
+        solver (CDCLSolver): The solver.
+        lits (sequence of int): The literals.
+        k (int): The number of true literals.
+    """
+    at_most(solver, lits, k)
+    at_least(solver, lits, k)
@@ -0,0 +1,295 @@
+import asyncio
+import json
+import os
+import struct
+import time
+from collections import deque
+from optparse import OptionParser
+from benchmark import percentile
+from minesweeper import Minesweeper
+from utils import Action, ActionType, Condition, generate_board
+
+# Framed protocol: every request and response is a 4-byte little-endian length followed by that many bytes.
+# A request starts with an operation code, a response with a status code (OK, or ERROR followed by a UTF-8 message).
+FRAME = struct.Struct('<I')
+CREATE, STEP, OBS, CLOSE, STATS = 1, 2, 3, 4, 5
+OK, ERROR = 0, 1
+OP_NAMES = {CREATE: 'create', STEP: 'step', OBS: 'obs', CLOSE: 'close', STATS: 'stats'}
+# CREATE: size, bombs, whether a seed follows, seed -> session id
+CREATE_REQUEST = struct.Struct('<IIBQ')
+SESSION = struct.Struct('<I')
+# STEP: session id, action code (0 reveal, 1 flag), x, y -> condition code, number of changed cells, then the cells
+STEP_REQUEST = struct.Struct('<IBII')
+STEP_RESPONSE = struct.Struct('<BI')
+CHANGE = struct.Struct('<IIb')
+# OBS: session id -> size, then size * size int8 cell codes in row-major order (see Minesweeper.obs_array)
+OBS_RESPONSE = struct.Struct('<I')
+ACTION_TYPES = (ActionType.REVEAL, ActionType.FLAG)
+CONDITION_CODES = {Condition.IN_PROGRESS: 0, Condition.WIN: 1, Condition.BOMB: 2}
+MAX_FRAME = 1 << 30
+
+
+class ProtocolError(Exception):
+    """Raised for a malformed request, or by the client for an ERROR response."""
+
+
+class GamePool:
+    def __init__(self, max_idle=64):
+        """
+        Keeps the games of closed sessions to reuse them for new sessions of the same board size.
+
+        A reused game is restarted with Minesweeper.reset, which keeps its cell storage instead of allocating a new one.
+
+        Args:
+            max_idle (int, optional): The number of idle games kept per board size. Defaults to 64.
+        """
+        self.max_idle = max_idle
+        self.idle = {}
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, size, bomb_map):
+        """
+        Returns a game on a bomb map, reusing an idle game of the same size if there is one.
+
+        Args:
+            size (int): The size of the board (size x size).
+            bomb_map: The bomb map, in any form accepted by Minesweeper.
+
+        Returns:
+            Minesweeper: A quiet, compact game in delta mode.
+        """
+        games = self.idle.get(size)
+        if games:
+            game = games.pop()
+            game.reset(bomb_map)
+            self.reused += 1
+            return game
+        self.created += 1
+        return Minesweeper(size=size, bomb_map=bomb_map, quiet=True, compact=True, delta=True)
+
+    def release(self, game):
+        """
+        Returns a game that is no longer used to the pool.
+
+        Args:
+            game (Minesweeper): The game.
+        """
+        games = self.idle.setdefault(game.size, [])
+        if len(games) < self.max_idle:
+            games.append(game)
+
+
+class SessionServer:
+    def __init__(self, pool=None, max_size=4096, latency_samples=10000):
+        """
+        Hosts many concurrent Minesweeper sessions for agents running in other processes.
+
+        Clients connect over a Unix socket or localhost TCP and send framed requests (see the constants of this
+        module): CREATE a session on a seeded or random board, STEP it with an action, which returns the changed
+        cells, fetch the whole board with OBS, CLOSE it, and read the server STATS. Sessions left open by a client
+        are closed when it disconnects. All the sessions run on one asyncio event loop.
+
+        Args:
+            pool (GamePool, optional): The pool of games to reuse. Defaults to a new pool.
+            max_size (int, optional): The largest board size a client can create. Defaults to 4096.
+            latency_samples (int, optional): The number of recent requests of every operation kept for the latency
+                                             percentiles. Defaults to 10000.
+        """
+        self.pool = pool if pool is not None else GamePool()
+        self.max_size = max_size
+        self.sessions = {}
+        self.next_session = 1
+        self.started = time.perf_counter()
+        self.opened = 0
+        self.closed = 0
+        self.requests = 0
+        self.latencies = {op: deque(maxlen=latency_samples) for op in OP_NAMES}
+
+    async def handle(self, reader, writer):
+        """
+        Serves the requests of one client connection until it disconnects.
+
+        Args:
+            reader (asyncio.StreamReader): The stream of the requests.
+            writer (asyncio.StreamWriter): The stream of the responses.
+        """
+        owned = set()
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(FRAME.size)
+                    length, = FRAME.unpack(header)
+                    if length > MAX_FRAME:
+                        break
+                    request = await reader.readexactly(length)
+                except asyncio.IncompleteReadError:
+                    break
+                start = time.perf_counter()
+                op = request[0] if request else None
+                try:
+                    response = bytes([OK]) + self.dispatch(op, memoryview(request)[1:], owned)
+                except (ProtocolError, ValueError, struct.error) as error:
+                    response = bytes([ERROR]) + str(error).encode()
+                writer.write(FRAME.pack(len(response)) + response)
+                self.requests += 1
+                if op in self.latencies:
+                    self.latencies[op].append(time.perf_counter() - start)
+                await writer.drain()
+        finally:
+            for session in owned:
+                self.close_session(session)
+            writer.close()
+
+    def dispatch(self, op, body, owned):
+        """
+        Executes a request.
+
+        Args:
+            op (int): The operation code.
+            body (memoryview): The request after the operation code.
+            owned (set of int): The sessions of the connection.
+
+        Returns:
+            bytes: The response after the status code.
+
+        Raises:
+            ProtocolError: If the request is malformed or refers to a session the connection does not own.
+        """
+        if op == STEP:
+            session, code, x, y = STEP_REQUEST.unpack(body)
+            game = self.game(session, owned)
+            if code >= len(ACTION_TYPES) or not (x < game.size and y < game.size):
+                raise ProtocolError(f"Invalid action {code} at ({x}, {y})")
+            _, condition, changes = game.step(Action(ACTION_TYPES[code], x, y))
+            return STEP_RESPONSE.pack(CONDITION_CODES[condition], len(changes)) + \
+                b''.join([CHANGE.pack(cx, cy, value) for cx, cy, value in changes])
+        if op == OBS:
+            game = self.game(SESSION.unpack(body)[0], owned)
+            return OBS_RESPONSE.pack(game.size) + game.obs_array().tobytes()
+        if op == CREATE:
+            size, bombs, has_seed, seed = CREATE_REQUEST.unpack(body)
+            if not 0 < size <= self.max_size:
+                raise ProtocolError(f"Board size {size} is out of range")
+            bomb_map = generate_board(size, bombs, seed=seed if has_seed else None, output='packed')
+            session = self.next_session
+            self.next_session += 1
+            self.sessions[session] = self.pool.acquire(size, bomb_map)
+            self.opened += 1
+            owned.add(session)
+            return SESSION.pack(session)
+        if op == CLOSE:
+            session, = SESSION.unpack(body)
+            self.game(session, owned)
+            self.close_session(session)
+            owned.discard(session)
+            return b''
+        if op == STATS:
+            return json.dumps(self.stats()).encode()
+        raise ProtocolError(f"Unknown operation {op}")
+
+    def game(self, session, owned):
+        """
+        Looks up the game of a session of a connection.
+
+        Args:
+            session (int): The session id.
+            owned (set of int): The sessions of the connection.
+
+        Returns:
+            Minesweeper: The game.
+
+        Raises:
+            ProtocolError: If there is no such session, or it belongs to another connection.
+        """
+        game = self.sessions.get(session) if session in owned else None
+        if game is None:
+            raise ProtocolError(f"Unknown session {session}")
+        return game
+
+    def close_session(self, session):
+        """
+        Ends a session and returns its game to the pool.
+
+        Args:
+            session (int): The session id.
+        """
+        game = self.sessions.pop(session, None)
+        if game is not None:
+            self.pool.release(game)
+            self.closed += 1
+
+    def stats(self):
+        """
+        Reports the activity of the server.
+
+        Returns:
+            dict: The open sessions, the sessions opened and closed, the closed sessions per second since the
+                  server started, the games created and reused by the pool, and the latency percentiles of every
+                  operation over its recent requests, in microseconds.
+        """
+        elapsed = time.perf_counter() - self.started
+        latency_us = {}
+        for op, samples in self.latencies.items():
+            if samples:
+                values = sorted(samples)
+                latency_us[OP_NAMES[op]] = {name: percentile(values, q) * 1e6
+                                            for name, q in (('p50', 50), ('p90', 90), ('p99', 99), ('max', 100))}
+        return {
+            'sessions_open': len(self.sessions),
+            'sessions_opened': self.opened,
+            'sessions_closed': self.closed,
+            'sessions_per_sec': self.closed / elapsed if elapsed else None,
+            'requests': self.requests,
+            'games_created': self.pool.created,
+            'games_reused': self.pool.reused,
+            'uptime_s': elapsed,
+            'latency_us': latency_us,
+        }
+
+    async def serve(self, host='127.0.0.1', port=8765, unix_path=None):
+        """
+        Accepts connections until cancelled.
+
+        Args:
+            host (str, optional): The address to listen on. Defaults to localhost.
+            port (int, optional): The TCP port to listen on. Defaults to 8765.
+            unix_path (str, optional): The path of a Unix socket to listen on instead of TCP. Defaults to None.
+        """
+        if unix_path:
+            server = await asyncio.start_unix_server(self.handle, path=unix_path)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    """
+    Main function to parse command-line options and run the session server.
+
+    Command-line options:
+    -p, --port: TCP port to listen on
+    -u, --unix: Path of a Unix socket to listen on instead of TCP
+    --max-size: Largest board size a client can create
+    --pool: Number of idle games kept per board size
+    """
+    parser = OptionParser()
+    parser.add_option("-p", "--port", dest="port", type="int", default=8765, help="TCP port to listen on")
+    parser.add_option("-u", "--unix", dest="unix_path", help="Path of a Unix socket to listen on instead of TCP")
+    parser.add_option("--max-size", dest="max_size", type="int", default=4096, help="Largest board size a client can create")
+    parser.add_option("--pool", dest="pool", type="int", default=64, help="Number of idle games kept per board size")
+
+    (options, args) = parser.parse_args()
+
+    server = SessionServer(GamePool(options.pool), max_size=options.max_size)
+    if options.unix_path and os.path.exists(options.unix_path):
+        os.remove(options.unix_path)
+    print(f"Serving on {options.unix_path or f'127.0.0.1:{options.port}'}")
+    try:
+        asyncio.run(server.serve(port=options.port, unix_path=options.unix_path))
+    except KeyboardInterrupt:
+        print(json.dumps(server.stats(), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+import json
+import socket
+import threading
+import time
+from array import array
+from optparse import OptionParser
+from agent import RuleBasedAgent
+from benchmark import percentile
+from minesweeper import BoardView
+from server import (CHANGE, CLOSE, CONDITION_CODES, CREATE, CREATE_REQUEST, ERROR, FRAME, OBS, OBS_RESPONSE,
+                    SESSION, STATS, STEP, STEP_REQUEST, STEP_RESPONSE, ProtocolError)
+from utils import ActionType, Cell, Condition
+
+CODE_CONDITIONS = {code: condition for condition, code in CONDITION_CODES.items()}
+
+
+class SessionClient:
+    def __init__(self, port=8765, host='127.0.0.1', unix_path=None):
+        """
+        Connects to a session server (see server.py) and sends it requests, one at a time.
+
+        Args:
+            port (int, optional): The TCP port of the server. Defaults to 8765.
+            host (str, optional): The address of the server. Defaults to localhost.
+            unix_path (str, optional): The path of the Unix socket of the server, used instead of TCP. Defaults to None.
+        """
+        if unix_path:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(unix_path)
+        else:
+            self.sock = socket.create_connection((host, port))
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.file = self.sock.makefile('rb')
+        self.latencies = []  # Round-trip time of every request, in seconds
+
+    def request(self, op, body=b''):
+        """
+        Sends a request and waits for its response.
+
+        Args:
+            op (int): The operation code.
+            body (bytes, optional): The request after the operation code. Defaults to empty.
+
+        Returns:
+            bytes: The response after the status code.
+
+        Raises:
+            ProtocolError: If the server answers with an error.
+            ConnectionError: If the server closes the connection before answering.
+        """
+        start = time.perf_counter()
+        self.sock.sendall(FRAME.pack(len(body) + 1) + bytes([op]) + body)
+        header = self.file.read(FRAME.size)
+        if len(header) != FRAME.size:
+            raise ConnectionError("The server closed the connection")
+        length, = FRAME.unpack(header)
+        response = self.file.read(length)
+        self.latencies.append(time.perf_counter() - start)
+        if len(response) != length:
+            raise ConnectionError("The server closed the connection")
+        if response[0] == ERROR:
+            raise ProtocolError(response[1:].decode())
+        return response[1:]
+
+    def create(self, size, bombs, seed=None):
+        """
+        Opens a session on a new board.
+
+        Args:
+            size (int): The size of the board (size x size).
+            bombs (int): The number of bombs on the board.
+            seed (int, optional): The seed of the board, see utils.generate_board. Defaults to a random board.
+
+        Returns:
+            int: The session id.
+        """
+        body = CREATE_REQUEST.pack(size, bombs, seed is not None, seed or 0)
+        return SESSION.unpack(self.request(CREATE, body))[0]
+
+    def step(self, session, action):
+        """
+        Takes a step in a session.
+
+        Args:
+            session (int): The session id.
+            action (Action): The action.
+
+        Returns:
+            tuple: The condition of the game, and the list of (x, y, code) cells changed by the action.
+        """
+        code = 0 if action.action_type == ActionType.REVEAL else 1
+        response = self.request(STEP, STEP_REQUEST.pack(session, code, action.x, action.y))
+        condition, count = STEP_RESPONSE.unpack_from(response)
+        changes = list(CHANGE.iter_unpack(response[STEP_RESPONSE.size:STEP_RESPONSE.size + count * CHANGE.size]))
+        return CODE_CONDITIONS[condition], changes
+
+    def obs(self, session):
+        """
+        Fetches the whole revealed board of a session.
+
+        Args:
+            session (int): The session id.
+
+        Returns:
+            tuple: The size of the board, and the int8 cell codes in row-major order (see Minesweeper.obs_array).
+        """
+        response = self.request(OBS, SESSION.pack(session))
+        size, = OBS_RESPONSE.unpack_from(response)
+        return size, response[OBS_RESPONSE.size:]
+
+    def close(self, session):
+        """
+        Ends a session.
+
+        Args:
+            session (int): The session id.
+        """
+        self.request(CLOSE, SESSION.pack(session))
+
+    def stats(self):
+        """
+        Reads the statistics of the server, see SessionServer.stats.
+
+        Returns:
+            dict: The statistics.
+        """
+        return json.loads(self.request(STATS))
+
+    def disconnect(self):
+        """
+        Closes the connection, which also closes the sessions left open.
+        """
+        self.file.close()
+        self.sock.close()
+
+
+class RemoteGame:
+    def __init__(self, client, size, bombs, seed=None):
+        """
+        A game played on a session server, with the interface agents use from Minesweeper.
+
+        The revealed board is mirrored locally from the changed cells returned by every step, so obs_array() does not
+        need a request. RuleBasedAgent can play a RemoteGame as it plays a local game.
+
+        Args:
+            client (SessionClient): The connection to the server.
+            size (int): The size of the board (size x size).
+            bombs (int): The number of bombs on the board.
+            seed (int, optional): The seed of the board. Defaults to a random board.
+        """
+        self.client = client
+        self.size = size
+        self.bombs = bombs
+        self.profiler = None
+        self.session = client.create(size, bombs, seed)
+        self._cells = array('b', [Cell.UNREVEALED.value]) * (size * size)
+        self._cells_view = memoryview(self._cells).cast('B').cast('b', [size, size]).toreadonly()
+        self._board_view = BoardView(self._cells, size, size)
+
+    def obs(self):
+        return self._board_view
+
+    def obs_array(self):
+        return self._cells_view
+
+    def step(self, action):
+        """
+        Takes a step on the server and applies the changed cells to the local board.
+
+        Args:
+            action (Action): The action.
+
+        Returns:
+            tuple: The observation and the condition of the game, as Minesweeper.step.
+        """
+        condition, changes = self.client.step(self.session, action)
+        size = self.size
+        for x, y, value in changes:
+            self._cells[x * size + y] = value
+        return self._board_view, condition
+
+    def step_many(self, actions):
+        """
+        Takes the steps of a batch one at a time, stopping when the game ends.
+
+        Args:
+            actions (list of Action): The actions.
+
+        Returns:
+            tuple: The observation and the condition of the game after the batch.
+        """
+        condition = Condition.IN_PROGRESS
+        for action in actions:
+            _, condition = self.step(action)
+            if condition != Condition.IN_PROGRESS:
+                break
+        return self._board_view, condition
+
+    def close(self):
+        """
+        Ends the session on the server.
+        """
+        self.client.close(self.session)
+
+
+def run_load(games, concurrency, size, bombs, seed=0, port=8765, unix_path=None):
+    """
+    Plays RuleBasedAgent games against a session server from several connections at once, to benchmark it.
+
+    Game i uses the board seed seed + i. Every connection runs in its own thread and plays one game at a time.
+
+    Args:
+        games (int): The total number of games.
+        concurrency (int): The number of connections.
+        size (int): The size of the boards (size x size).
+        bombs (int): The number of bombs on the boards.
+        seed (int, optional): The seed of the first board. Defaults to 0.
+        port (int, optional): The TCP port of the server. Defaults to 8765.
+        unix_path (str, optional): The path of the Unix socket of the server. Defaults to None.
+
+    Returns:
+        dict: The games played and won, games/sec, the client-side request latency percentiles in microseconds,
+              and the statistics of the server.
+    """
+    next_game = iter(range(games))
+    lock = threading.Lock()
+    results = []
+    latencies = []
+
+    def worker():
+        client = SessionClient(port=port, unix_path=unix_path)
+        try:
+            while True:
+                with lock:
+                    i = next(next_game, None)
+                if i is None:
+                    break
+                game = RemoteGame(client, size, bombs, seed + i)
+                condition = RuleBasedAgent(game).play()
+                game.close()
+                with lock:
+                    results.append(condition)
+        finally:
+            with lock:
+                latencies.extend(client.latencies)
+            client.disconnect()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    client = SessionClient(port=port, unix_path=unix_path)
+    server_stats = client.stats()
+    client.disconnect()
+    return {
+        'games': len(results),
+        'wins': sum(1 for condition in results if condition == Condition.WIN),
+        'elapsed_s': elapsed,
+        'games_per_sec': len(results) / elapsed,
+        'requests': len(latencies),
+        'latency_us': {name: percentile(latencies, q) * 1e6 if latencies else None
+                       for name, q in (('p50', 50), ('p90', 90), ('p99', 99), ('max', 100))},
+        'server': server_stats,
+    }
+
+
+def main():
+    """
+    Main function to parse command-line options and run the load generator against a session server.
+
+    Command-line options:
+    -g, --games: Total number of games
+    -c, --concurrency: Number of connections playing at the same time
+    -s, --size: Size of the boards (size x size)
+    -b, --bombs: Number of bombs on the boards
+    --seed: Seed of the first board
+    -p, --port: TCP port of the server
+    -u, --unix: Path of the Unix socket of the server
+    """
+    parser = OptionParser()
+    parser.add_option("-g", "--games", dest="games", type="int", default=1000, help="Total number of games")
+    parser.add_option("-c", "--concurrency", dest="concurrency", type="int", default=8, help="Number of connections playing at the same time")
+    parser.add_option("-s", "--size", dest="size", type="int", default=16, help="Size of the boards (size x size)")
+    parser.add_option("-b", "--bombs", dest="bombs", type="int", default=40, help="Number of bombs on the boards")
+    parser.add_option("--seed", dest="seed", type="int", default=0, help="Seed of the first board")
+    parser.add_option("-p", "--port", dest="port", type="int", default=8765, help="TCP port of the server")
+    parser.add_option("-u", "--unix", dest="unix_path", help="Path of the Unix socket of the server")
+
+    (options, args) = parser.parse_args()
+
+    report = run_load(options.games, options.concurrency, options.size, options.bombs, options.seed,
+                      options.port, options.unix_path)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+from math import comb
+
+from utils import Cell, neighbor_index
+
+
+class FrontierSolver:
+    def __init__(self, max_cache=4096, max_nodes=100000):
+        """
+        Exact bomb probabilities of the unrevealed cells of a Minesweeper board.
+
+        The unrevealed cells next to revealed numbers (the frontier) are split into independent connected
+        components. The solutions of every component are counted by backtracking, per number of bombs, and
+        the components are combined with the global bomb count. The cells away from the frontier share the
+        bombs that are left.
+
+        Component results are cached by their constraint signature, relative to the component's own cells,
+        so a component that did not change since the previous move (or that repeats elsewhere) is not solved again.
+
+        The backtracking of a component gives up after max_nodes search nodes. The cells of such a component get
+        a local estimate instead (see _local_estimates), and the component is counted as holding the rounded sum of
+        the estimates when it is combined with the others.
+
+        Args:
+            max_cache (int, optional): The number of component results to keep. Defaults to 4096.
+            max_nodes (int, optional): The search budget of a component. Defaults to 100000.
+        """
+        self.max_cache = max_cache
+        self.max_nodes = max_nodes
+        self.cache = {}
+
+    def probabilities(self, view, size, bombs, mines=(), width=None):
+        """
+        Computes the probability that each unrevealed cell contains a bomb.
+
+        Args:
+            view: The revealed board, indexed as view[x, y] and holding the integer codes of Minesweeper.obs_array().
+            size (int): The size of the board (size x size), or its number of rows if a width is given.
+            bombs (int): The total number of bombs on the board.
+            mines (iterable of int, optional): Flat indices of cells known to contain a bomb, in addition to the
+                                               flagged cells. Defaults to none.
+            width (int, optional): The number of columns of a rectangular board. Defaults to size.
+
+        Returns:
+            tuple: A dict mapping the flat index of every frontier cell to its bomb probability, the bomb
+                   probability of the other unrevealed cells (None if there are none), and a dict mapping the
+                   frontier cells proved safe to 0 and those proved to be bombs to 1. Proofs come from the exact
+                   integer counts only: there are none for estimated components, nor when the board admits no
+                   solution at all. Once a component is estimated, the bomb count proves nothing, and only the
+                   cells with the same value in every solution of their own component are proven.
+        """
+        width = size if width is None else width
+        mines = set(mines)
+        unknown = set()
+        for i in range(size * width):
+            value = view[divmod(i, width)]
+            if value == Cell.FLAGGED.value:
+                mines.add(i)
+            elif value < 0 and i not in mines:
+                unknown.add(i)
+
+        constraints = {}
+        index = neighbor_index(size, width)
+        for i in range(size * width):
+            value = view[divmod(i, width)]
+            if value <= 0:
+                continue
+            cells = []
+            for n in index.neighbors(i):
+                if n in mines:
+                    value -= 1
+                elif n in unknown:
+                    cells.append(n)
+            if cells:
+                constraints[tuple(cells)] = value
+
+        components = self._components(constraints)
+        frontier = sum(len(cells) for cells, _ in components)
+        others = len(unknown) - frontier
+        remaining = bombs - len(mines)
+
+        results = []
+        exact = []
+        for cells, cons in components:
+            result = self._solve(cells, cons)
+            exact.append(result is not None)
+            if result is None:
+                # Too large to count exactly: a single solution with the estimates as per-cell bomb counts
+                estimates = _local_estimates(cells, cons)
+                k = round(sum(estimates))
+                result = {k: 1}, {k: estimates}
+            results.append(result)
+        # Bomb-count distributions of the frontier without each component, from prefix and suffix products
+        prefix = [{0: 1}]
+        for counts, _ in results:
+            prefix.append(_convolve(prefix[-1], counts))
+        suffix = [{0: 1}]
+        for counts, _ in reversed(results):
+            suffix.append(_convolve(suffix[-1], counts))
+        suffix.reverse()
+
+        def weight(k):
+            # Ways to place the bombs left by k frontier bombs on the cells away from the frontier
+            return comb(others, remaining - k) if 0 <= remaining - k <= others else 0
+
+        total = sum(ways * weight(k) for k, ways in prefix[-1].items())
+        if total == 0:
+            # No solution, from an inconsistent board or estimates that do not fit the bomb count: estimate only
+            probabilities = {}
+            for cells, cons in components:
+                probabilities.update(zip(cells, _local_estimates(cells, cons)))
+            other = min(1.0, max(0.0, remaining / others)) if others else None
+            return probabilities, other, {}
+
+        probabilities = {}
+        proofs = {}
+        # The bomb count only proves cells when every component is counted exactly, an estimated component gives a
+        # guessed count. A cell with the same value in every solution of its own exact component is proven anyway.
+        counted = all(exact)
+        for c, ((cells, _), (counts, cell_counts)) in enumerate(zip(components, results)):
+            rest = _convolve(prefix[c], suffix[c + 1])
+            scale = {k: sum(ways * weight(k + j) for j, ways in rest.items()) for k in counts}
+            for v, i in enumerate(cells):
+                numerator = sum(cell_counts[k][v] * scale[k] for k in counts)
+                probabilities[i] = numerator / total
+                if not exact[c]:
+                    continue
+                if counted and (numerator == 0 or numerator == total):
+                    proofs[i] = 0 if numerator == 0 else 1
+                elif all(cell_counts[k][v] == 0 for k in counts):
+                    proofs[i] = 0
+                elif all(cell_counts[k][v] == ways for k, ways in counts.items()):
+                    proofs[i] = 1
+        other = None
+        if others:
+            expected = sum(ways * weight(k) * (remaining - k) for k, ways in prefix[-1].items())
+            other = expected / total / others
+        return probabilities, other, proofs
+
+    def _components(self, constraints):
+        """
+        Splits the constraints into groups that share no cell.
+
+        Args:
+            constraints (dict): Maps a tuple of cells to the number of bombs among them.
+
+        Returns:
+            list: One (sorted cells, constraints) pair per component.
+        """
+        parent = {}
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for cells in constraints:
+            for i in cells:
+                parent.setdefault(i, i)
+            root = find(cells[0])
+            for i in cells[1:]:
+                parent[find(i)] = root
+
+        groups = {}
+        for cells, value in constraints.items():
+            groups.setdefault(find(cells[0]), []).append((cells, value))
+        components = []
+        for cons in groups.values():
+            cells = sorted({i for group, _ in cons for i in group})
+            components.append((cells, cons))
+        return components
+
+    def _solve(self, cells, constraints):
+        """
+        Counts the solutions of one component, using the cache.
+
+        Args:
+            cells (list of int): The sorted cells of the component.
+            constraints (list): The (cells, bombs) constraints of the component.
+
+        Returns:
+            tuple: A dict mapping a number of bombs k to the number of solutions with k bombs, and a dict
+                   mapping k to the number of those solutions in which each cell (by position in cells) is a bomb,
+                   or None if the search exceeded its budget.
+        """
+        local = {i: v for v, i in enumerate(cells)}
+        signature = (len(cells), tuple(sorted((tuple(local[i] for i in group), value) for group, value in constraints)))
+        result = self.cache.get(signature)
+        if result is None:
+            result = _count_solutions(*signature, self.max_nodes)
+            if len(self.cache) >= self.max_cache:
+                self.cache.clear()
+            self.cache[signature] = result
+        return result
+
+
+class _BudgetExceeded(Exception):
+    pass
+
+
+def _local_estimates(cells, constraints):
+    """
+    Estimates the bomb probability of the cells of a component from the constraints around each cell alone.
+
+    Args:
+        cells (list of int): The sorted cells of the component.
+        constraints (list): The (cells, bombs) constraints of the component.
+
+    Returns:
+        list of float: For every cell, the mean density of bombs of the constraints it belongs to.
+    """
+    totals = dict.fromkeys(cells, 0.0)
+    counts = dict.fromkeys(cells, 0)
+    for group, value in constraints:
+        density = min(1.0, max(0.0, value / len(group)))
+        for i in group:
+            totals[i] += density
+            counts[i] += 1
+    return [totals[i] / counts[i] for i in cells]
+
+
+def _count_solutions(nvars, constraints, max_nodes=None):
+    """
+    Enumerates the bomb assignments of a component by backtracking.
+
+    Args:
+        nvars (int): The number of cells.
+        constraints (tuple): The (cell indices, bombs) constraints.
+        max_nodes (int, optional): The number of search nodes after which the search gives up. Defaults to no limit.
+
+    Returns:
+        tuple: The solution counts per number of bombs, and the per-cell bomb counts per number of bombs, or None
+               if the search gave up.
+    """
+    by_var = [[] for _ in range(nvars)]
+    for c, (group, _) in enumerate(constraints):
+        for v in group:
+            by_var[v].append(c)
+    need = [value for _, value in constraints]
+    left = [len(group) for group, _ in constraints]
+    assignment = [0] * nvars
+    counts = {}
+    cell_counts = {}
+    budget = [max_nodes]
+
+    def search(v, k):
+        if budget[0] is not None:
+            budget[0] -= 1
+            if budget[0] < 0:
+                raise _BudgetExceeded()
+        if v == nvars:
+            if k not in counts:
+                counts[k] = 0
+                cell_counts[k] = [0] * nvars
+            counts[k] += 1
+            tally = cell_counts[k]
+            for u in range(nvars):
+                tally[u] += assignment[u]
+            return
+        for bit in (0, 1):
+            feasible = True
+            for c in by_var[v]:
+                left[c] -= 1
+                need[c] -= bit
+                if need[c] < 0 or need[c] > left[c]:
+                    feasible = False
+            if feasible:
+                assignment[v] = bit
+                search(v + 1, k + bit)
+            for c in by_var[v]:
+                left[c] += 1
+                need[c] += bit
+        assignment[v] = 0
+
+    try:
+        search(0, 0)
+    except _BudgetExceeded:
+        return None
+    return counts, cell_counts
+
+
+def _convolve(a, b):
+    """
+    Combines two bomb-count distributions of independent sets of cells.
+
+    Args:
+        a (dict): Maps a number of bombs to a number of ways.
+        b (dict): Maps a number of bombs to a number of ways.
+
+    Returns:
+        dict: The distribution of the total number of bombs.
+    """
+    result = {}
+    for i, x in a.items():
+        for j, y in b.items():
+            result[i + j] = result.get(i + j, 0) + x * y
+    return result
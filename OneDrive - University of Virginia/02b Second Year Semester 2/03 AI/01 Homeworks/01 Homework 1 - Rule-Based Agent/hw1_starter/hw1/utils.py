@@ -1,4 +1,14 @@
+import mmap
+import os
+import random
+import struct
 from enum import Enum
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, the pure-Python fallbacks are used without it
+    np = None
 
 
 class Cell(Enum):
@@ -21,35 +31,475 @@ class Action:
         self.x = x
         self.y = y
 
-def create_random_board(size, bombs):
+# Offsets of the eight cells surrounding a cell
+DIRECTIONS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+
+class NeighborIndex:
+    def __init__(self, rows, cols=None, offsets=DIRECTIONS):
+        """
+        Precomputed neighbors of the cells of a rows x cols board, identified by their flat index x * cols + y.
+
+        The neighbors of a cell away from the edges are the cell plus fixed flat offsets, so only the cells near the
+        edges, whose neighbors are cut by the board, get a precomputed tuple. Use neighbor_index() to share the
+        index of a board size across games.
+
+        Attributes:
+            offsets (tuple of int): The flat offsets of the neighbors of an interior cell.
+            edges (dict): Maps the flat index of every cell near an edge to the tuple of its neighbors.
+
+        Args:
+            rows (int): The number of rows of the board.
+            cols (int, optional): The number of columns of the board. Defaults to rows.
+            offsets (tuple, optional): The (dx, dy) offsets of the neighbors. Defaults to the eight adjacent cells.
+        """
+        cols = rows if cols is None else cols
+        self.rows = rows
+        self.cols = cols
+        self.offsets = tuple(dx * cols + dy for dx, dy in offsets)
+        reach = max(max(abs(dx), abs(dy)) for dx, dy in offsets)
+        self.edges = {}
+        for x in range(rows):
+            if reach <= x < rows - reach:
+                ys = [y for y in range(cols) if y < reach or y >= cols - reach]
+            else:
+                ys = range(cols)
+            for y in ys:
+                self.edges[x * cols + y] = tuple((x + dx) * cols + y + dy for dx, dy in offsets
+                                                 if 0 <= x + dx < rows and 0 <= y + dy < cols)
+
+    def neighbors(self, i):
         """
-        Creates a square game board with randomly placed bombs.
+        Lists the neighbors of a cell that are within the board.
 
         Args:
-            size (int): The size of the board (size x size).
+            i (int): The flat index of the cell.
+
+        Returns:
+            sequence of int: The flat indices of the neighbors.
+        """
+        edge = self.edges.get(i)
+        if edge is not None:
+            return edge
+        return [i + offset for offset in self.offsets]
+
+@lru_cache(maxsize=32)
+def neighbor_index(rows, cols=None, offsets=DIRECTIONS):
+    """
+    Returns the shared NeighborIndex of a board size, built on first use.
+
+    Args:
+        rows (int): The number of rows of the board.
+        cols (int, optional): The number of columns of the board. Defaults to rows.
+        offsets (tuple, optional): The (dx, dy) offsets of the neighbors. Defaults to the eight adjacent cells.
+
+    Returns:
+        NeighborIndex: The neighbor index.
+    """
+    return NeighborIndex(rows, cols, offsets)
+
+def create_random_board(size, bombs, rng=None, width=None):
+        """
+        Creates a game board with randomly placed bombs.
+
+        Args:
+            size (int): The size of the board (size x size), or its number of rows if a width is given.
             bombs (int): The number of bombs to place on the board.
+            rng (random.Random, optional): The random number generator to use. Defaults to the global one of the random module.
+            width (int, optional): The number of columns of a rectangular board. Defaults to size.
 
         Returns:
             list: A 2D list representing the game board, where ' ' indicates an empty cell and 'B' indicates a bomb.
         """
-        import random
-        board = [[' ' for _ in range(size)] for _ in range(size)]
-        bomb_positions = random.sample(range(size * size), bombs)
+        width = size if width is None else width
+        board = [[' ' for _ in range(width)] for _ in range(size)]
+        bomb_positions = (rng or random).sample(range(size * width), bombs)
         for pos in bomb_positions:
-            x, y = divmod(pos, size)
+            x, y = divmod(pos, width)
             board[x][y] = 'B'
         return board
 
+def generate_board(size, bombs, seed=None, rng=None, first_click=None, zero_first_click=False, output='rows', width=None):
+    """
+    Generates a board with randomly placed bombs from an explicit seed or random number generator.
+
+    The bomb positions are sampled without building the board first, so large boards are fast to generate,
+    and a given seed gives the same board whether or not NumPy is installed.
+
+    Args:
+        size (int): The size of the board (size x size), or its number of rows if a width is given.
+        bombs (int): The number of bombs to place on the board.
+        seed (int, optional): The seed of a new random.Random, used if rng is None. Defaults to None.
+        rng (random.Random or numpy.random.Generator, optional): The random number generator to use. A NumPy
+                                                                 generator samples very large boards much faster.
+                                                                 Defaults to None.
+        first_click (tuple, optional): The (x, y) cell of the first click, which is guaranteed not to contain a bomb.
+                                       Defaults to None.
+        zero_first_click (bool, optional): Whether the cells around the first click are also kept free of bombs, so
+                                           that the first click opens an area. Defaults to False.
+        output (str, optional): 'rows' for the list-of-lists form of create_random_board, 'packed' for a flat bytearray
+                                with one byte per cell (see pack_bomb_map) or 'numpy' for a boolean NumPy array.
+                                Defaults to 'rows'.
+        width (int, optional): The number of columns of a rectangular board, size being its number of rows.
+                               Defaults to size.
+
+    Returns:
+        The bomb map in the requested form.
+
+    Raises:
+        ValueError: If the bombs do not fit in the cells left free, if zero_first_click is set without a first_click,
+                    or if output is not one of the forms above.
+        ImportError: If output is 'numpy' and NumPy is not installed.
+    """
+    if output not in ('rows', 'packed', 'numpy'):
+        raise ValueError(f"Unknown output {output!r}, expected 'rows', 'packed' or 'numpy'")
+    if output == 'numpy' and np is None:
+        raise ImportError("output='numpy' requires NumPy, use output='packed' without it")
+    if zero_first_click and first_click is None:
+        raise ValueError("zero_first_click requires the first_click cell to keep free")
+    if rng is None:
+        rng = random.Random(seed)
+    width = size if width is None else width
+    cell_count = size * width
+    excluded = []
+    if first_click is not None:
+        x, y = first_click
+        around = [(x + dx, y + dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)] if zero_first_click else [(x, y)]
+        excluded = sorted(nx * width + ny for nx, ny in around if 0 <= nx < size and 0 <= ny < width)
+    if bombs > cell_count - len(excluded):
+        raise ValueError(f"{bombs} bombs do not fit on a {size}x{width} board with {len(excluded)} cells kept free")
+
+    if np is not None and isinstance(rng, np.random.Generator):
+        positions = rng.choice(cell_count - len(excluded), bombs, replace=False)
+        # Shift the sampled positions past the excluded cells, which keeps the distribution uniform
+        for cell in excluded:
+            positions += positions >= cell
+    else:
+        positions = rng.sample(range(cell_count - len(excluded)), bombs)
+        for i, pos in enumerate(positions):
+            for cell in excluded:
+                if pos >= cell:
+                    pos += 1
+            positions[i] = pos
+
+    if output == 'numpy':
+        board = np.zeros(cell_count, dtype=bool)
+        board[positions] = True
+        return board.reshape(size, width)
+    if isinstance(positions, list):
+        cells = bytearray(cell_count)
+        for pos in positions:
+            cells[pos] = 1
+    else:
+        cells = np.zeros(cell_count, dtype=np.uint8)
+        cells[positions] = 1
+        cells = bytearray(cells.tobytes())
+    if output == 'packed':
+        return cells
+    text = cells.translate(_BOMB_CHARS).decode('latin-1')
+    return [list(text[x * width:(x + 1) * width]) for x in range(size)]
+
+def board_stream(size, bombs, seed=None, count=None, **options):
+    """
+    Generates a sequence of boards from a single random stream, for example a benchmark corpus.
+
+    Args:
+        size (int): The size of the boards (size x size).
+        bombs (int): The number of bombs of each board.
+        seed (int, optional): The seed of the stream, used if no rng is given in options. Defaults to None.
+        count (int, optional): The number of boards. Defaults to an endless stream.
+        **options: Other arguments of generate_board (rng, first_click, zero_first_click, output).
+
+    Yields:
+        The bomb maps, as returned by generate_board.
+    """
+    rng = options.pop('rng', None) or random.Random(seed)
+    generated = 0
+    while count is None or generated < count:
+        yield generate_board(size, bombs, rng=rng, **options)
+        generated += 1
+
 def read_bomb_map(file_path):
     """
     Reads a bomb map from a file and returns it as a list of lists.
 
+    Files in the packed binary format (see write_packed_bomb_map) are memory-mapped instead of parsed
+    and returned as a PackedBombMap.
+
     Args:
         file_path (str): The path to the file containing the bomb map.
 
     Returns:
         list of list of str: A 2D list representing the bomb map, where each inner list is a row of the map.
+
+    Raises:
+        ValueError: If the rows do not all have the same length or contain characters other than ' ' and 'B'.
     """
+    with open(file_path, 'rb') as file:
+        if file.read(len(PACKED_MAGIC)) == PACKED_MAGIC:
+            return PackedBombMap(file_path)
     with open(file_path, 'r') as file:
-        bomb_map = [list(line.strip('\n')) for line in file.readlines()]
+        bomb_map = [list(line.rstrip('\r\n')) for line in file.readlines()]
+    while bomb_map and not bomb_map[-1]:
+        bomb_map.pop()  # Ignore blank lines at the end of the file
+    for row, line in enumerate(bomb_map):
+        if len(line) != len(bomb_map[0]):
+            raise ValueError(f"{file_path}: row {row + 1} has {len(line)} cells, expected {len(bomb_map[0])}")
+        if set(line) - {' ', 'B'}:
+            raise ValueError(f"{file_path}: row {row + 1} contains characters other than ' ' and 'B'")
     return bomb_map
+
+# Packed binary bomb maps: a header with the magic bytes, format version, width, height and number of
+# bombs (little-endian), followed by one bit per cell in row-major order, least significant bit first
+PACKED_MAGIC = b'MSBM'
+PACKED_VERSION = 1
+PACKED_HEADER = struct.Struct('<4sB3xIII')
+
+class PackedBombMap:
+    def __init__(self, file_path):
+        """
+        A bomb map in the packed binary format, memory-mapped from a file.
+
+        Only the header is read and validated when the map is opened. The bits are accessed in place through
+        the memory map, and unpack() expands them to the one-byte-per-cell form that Minesweeper uses.
+        Minesweeper copies the cells, so the map can be closed once the game is created, with close() or by
+        using the map as a context manager.
+
+        Args:
+            file_path (str): The path to the packed bomb map.
+
+        Raises:
+            ValueError: If the header is invalid or the file is too short for the board it describes.
+        """
+        self._mmap = None
+        self.bits = None
+        with open(file_path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size < PACKED_HEADER.size:
+                raise ValueError(f"{file_path}: truncated, shorter than the {PACKED_HEADER.size}-byte header")
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.width, self.height, self.bombs = PACKED_HEADER.unpack_from(self._mmap)
+        nbytes = (self.width * self.height + 7) // 8
+        if magic != PACKED_MAGIC or version != PACKED_VERSION:
+            self.close()
+            raise ValueError(f"{file_path}: not a packed bomb map of version {PACKED_VERSION}")
+        if len(self._mmap) < PACKED_HEADER.size + nbytes:
+            self.close()
+            raise ValueError(f"{file_path}: truncated, expected {nbytes} bytes of cells")
+        self.bits = memoryview(self._mmap)[PACKED_HEADER.size:PACKED_HEADER.size + nbytes]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        # The number of rows, like the list-of-lists form of a bomb map
+        return self.height
+
+    def is_bomb(self, x, y):
+        """
+        Tells whether a cell contains a bomb.
+
+        Args:
+            x (int): The row of the cell.
+            y (int): The column of the cell.
+
+        Returns:
+            bool: True if the cell contains a bomb.
+        """
+        i = x * self.width + y
+        return bool(self.bits[i >> 3] >> (i & 7) & 1)
+
+    def unpack(self):
+        """
+        Expands the bits to one byte per cell.
+
+        Returns:
+            bytearray: The flat, row-major bomb map, 1 for a bomb and 0 otherwise (see pack_bomb_map).
+        """
+        return unpack_bits(self.bits, self.width * self.height)
+
+    def to_rows(self):
+        """
+        Converts the map to the list-of-lists form returned by read_bomb_map for text files.
+
+        Returns:
+            list of list of str: The rows of the map, with 'B' for a bomb and ' ' otherwise.
+        """
+        text = self.unpack().translate(_BOMB_CHARS).decode('latin-1')
+        return [list(text[x * self.width:(x + 1) * self.width]) for x in range(self.height)]
+
+    def validate(self):
+        """
+        Checks that the number of bombs in the header matches the bits, and that the padding bits are zero.
+
+        Raises:
+            ValueError: If the map is inconsistent.
+        """
+        value = int.from_bytes(self.bits, 'little')
+        if value >> (self.width * self.height):
+            raise ValueError("the padding bits after the last cell are not zero")
+        if value.bit_count() != self.bombs:
+            raise ValueError(f"the header has {self.bombs} bombs but the map has {value.bit_count()}")
+
+    def close(self):
+        """
+        Releases the memory map and its file. The map cannot be read afterwards; closing it again does nothing.
+        """
+        if self.bits is not None:
+            self.bits.release()
+            self.bits = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+def pack_bits(cells):
+    """
+    Packs a flat map with one byte per cell (0 or 1) into a bitset, least significant bit first.
+
+    Args:
+        cells (bytes): The flat map.
+
+    Returns:
+        bytes: The bitset, (len(cells) + 7) // 8 bytes long.
+    """
+    if np is not None:
+        return np.packbits(np.frombuffer(bytes(cells), dtype=np.uint8), bitorder='little').tobytes()
+    # Bit k of the integer is cell k: the binary digits are the cells in reverse order
+    digits = bytes(cells).translate(_BIT_DIGITS)[::-1]
+    return int(digits or b'0', 2).to_bytes((len(cells) + 7) // 8, 'little')
+
+def unpack_bits(bits, count):
+    """
+    Expands a bitset, least significant bit first, to one byte per cell.
+
+    Args:
+        bits (bytes): The bitset.
+        count (int): The number of cells.
+
+    Returns:
+        bytearray: The flat map, 1 for a set bit and 0 otherwise.
+    """
+    if np is not None:
+        return bytearray(np.unpackbits(np.frombuffer(bits, dtype=np.uint8), count=count, bitorder='little').tobytes())
+    value = int.from_bytes(bits, 'little') & ((1 << count) - 1)
+    return bytearray(format(value, f'0{count}b')[::-1].encode('latin-1').translate(_DIGIT_BITS))
+
+def write_packed_bomb_map(file_path, bomb_map):
+    """
+    Writes a bomb map in the packed binary format.
+
+    Args:
+        file_path (str): The path of the file to write.
+        bomb_map (list of list of str or PackedBombMap): The bomb map, rows of equal length where 'B' indicates a bomb.
+    """
+    cells = pack_bomb_map(bomb_map)
+    height = len(bomb_map)
+    width = len(cells) // height if height else 0
+    with open(file_path, 'wb') as file:
+        file.write(PACKED_HEADER.pack(PACKED_MAGIC, PACKED_VERSION, width, height, cells.count(1)))
+        file.write(pack_bits(cells))
+
+def write_bomb_map(file_path, bomb_map):
+    """
+    Writes a bomb map in the text format read by read_bomb_map.
+
+    Args:
+        file_path (str): The path of the file to write.
+        bomb_map (list of list of str or PackedBombMap): The bomb map.
+    """
+    rows = bomb_map.to_rows() if isinstance(bomb_map, PackedBombMap) else bomb_map
+    with open(file_path, 'w') as file:
+        file.writelines(''.join(row) + '\n' for row in rows)
+
+def convert_bomb_map(src_path, dst_path):
+    """
+    Converts a bomb map file from the text format to the packed binary format, or the other way around.
+
+    Args:
+        src_path (str): The path of the bomb map to convert.
+        dst_path (str): The path of the converted bomb map.
+    """
+    bomb_map = read_bomb_map(src_path)
+    if isinstance(bomb_map, PackedBombMap):
+        write_bomb_map(dst_path, bomb_map)
+        bomb_map.close()
+    else:
+        write_packed_bomb_map(dst_path, bomb_map)
+
+# Translation table that maps the characters of a bomb map to 1 for 'B' and 0 for anything else
+_BOMB_BYTES = bytes(1 if c == ord('B') else 0 for c in range(256))
+# Translation tables between flat maps (bytes 0 and 1) and bomb map characters or binary digits
+_BOMB_CHARS = bytes([ord(' '), ord('B')]) + bytes(254)
+_BIT_DIGITS = b'01' + bytes(254)
+_DIGIT_BITS = bytes(1 if c == ord('1') else 0 for c in range(256))
+
+def pack_bomb_map(bomb_map):
+    """
+    Packs a bomb map into a flat, row-major bytearray.
+
+    Args:
+        bomb_map (list of list of str or PackedBombMap): A 2D list representing the bomb map, where 'B' indicates a bomb.
+                                                         Flat maps and NumPy arrays from generate_board are accepted too.
+
+    Returns:
+        bytearray: One byte per cell, 1 for a bomb and 0 otherwise.
+    """
+    if isinstance(bomb_map, PackedBombMap):
+        return bomb_map.unpack()
+    if isinstance(bomb_map, (bytes, bytearray)):
+        return bytearray(bomb_map)
+    if np is not None and isinstance(bomb_map, np.ndarray):
+        return bytearray(bomb_map.astype(np.uint8).tobytes())
+    return bytearray(''.join(map(''.join, bomb_map)).encode('latin-1').translate(_BOMB_BYTES))
+
+def bomb_map_width(bomb_map):
+    """
+    Returns the number of columns of a bomb map, its number of rows being len(bomb_map).
+
+    Args:
+        bomb_map (list of list of str or PackedBombMap): The bomb map, as returned by read_bomb_map.
+
+    Returns:
+        int: The number of columns.
+    """
+    width = getattr(bomb_map, 'width', None)
+    if width is not None:
+        return width
+    return len(bomb_map[0]) if len(bomb_map) else 0
+
+def count_adjacent_bombs_grid(bombs, rows, cols):
+    """
+    Counts, for every cell of a packed bomb map, the number of bombs in the eight surrounding cells.
+
+    The counts are computed with NumPy when it is available and with a pure-Python fallback otherwise.
+
+    Args:
+        bombs (bytes): The packed bomb map, one byte per cell in row-major order (see pack_bomb_map).
+        rows (int): The number of rows of the board.
+        cols (int): The number of columns of the board.
+
+    Returns:
+        bytearray: The number of adjacent bombs of each cell, in row-major order.
+    """
+    if np is not None and rows and cols:
+        grid = np.frombuffer(bytes(bombs), dtype=np.uint8).reshape(rows, cols)
+        padded = np.pad(grid, 1)
+        counts = (padded[:-2, :-2] + padded[:-2, 1:-1] + padded[:-2, 2:] +
+                  padded[1:-1, :-2] + padded[1:-1, 2:] +
+                  padded[2:, :-2] + padded[2:, 1:-1] + padded[2:, 2:])
+        return bytearray(counts.tobytes())
+
+    # Sum each row over a sliding window of three columns, then add up three of those rows
+    window = []
+    for x in range(rows):
+        padded = b'\0' + bytes(bombs[x * cols:(x + 1) * cols]) + b'\0'
+        window.append([padded[y] + padded[y + 1] + padded[y + 2] for y in range(cols)])
+    zeros = [0] * cols
+    counts = bytearray(rows * cols)
+    for x in range(rows):
+        above = window[x - 1] if x > 0 else zeros
+        below = window[x + 1] if x + 1 < rows else zeros
+        row = bombs[x * cols:(x + 1) * cols]
+        counts[x * cols:(x + 1) * cols] = bytes(a + w + b - c for a, w, b, c in zip(above, window[x], below, row))
+    return counts